@@ -6,10 +6,13 @@ const { emitToDashboard } = require('../services/socketService');
 
 const prisma = new PrismaClient();
 
-exports.logActivity = asyncHandler(async (req, res) => {
-  const { deviceId, activityType, repository, branch, commitHash, details, ipAddress } = req.validatedData;
+// Longest a batch of up to 500 activities may hold its transaction open
+const BATCH_TRANSACTION_TIMEOUT = 30000;
+
+const storeActivity = async (client, data, requestIp) => {
+  const { deviceId, activityType, repository, branch, commitHash, details, ipAddress } = data;
 
-  const device = await prisma.device.findUnique({
+  const device = await client.device.findUnique({
     where: { id: deviceId },
     include: { user: true }
   });
@@ -26,7 +29,7 @@ exports.logActivity = asyncHandler(async (req, res) => {
     branch,
     commitHash,
     details,
-    ipAddress: ipAddress || req.ip
+    ipAddress: ipAddress || requestIp
   };
 
   const securityAnalysis = await securityService.analyzeActivity({
@@ -34,7 +37,7 @@ exports.logActivity = asyncHandler(async (req, res) => {
     device
   });
 
-  const activity = await prisma.activity.create({
+  const activity = await client.activity.create({
     data: {
       ...activityData,
       isSuspicious: securityAnalysis.isSuspicious,
@@ -58,6 +61,13 @@ exports.logActivity = asyncHandler(async (req, res) => {
     }
   });
 
+  return { activity, securityAnalysis, device };
+};
+
+// Alerts, encryption and dashboard updates, once the activity is committed
+const announceActivity = async ({ activity, securityAnalysis, device }) => {
+  const { activityType, repository } = activity;
+
   if (securityAnalysis.isSuspicious) {
     await securityService.createAlert(
       activity.id,
@@ -74,6 +84,16 @@ exports.logActivity = asyncHandler(async (req, res) => {
   emitToDashboard('new-activity', activity);
 
   logger.info(`Activity logged: ${activityType} by ${device.user.email}`);
+};
+
+const recordActivity = async (data, requestIp) => {
+  const stored = await storeActivity(prisma, data, requestIp);
+  await announceActivity(stored);
+  return stored;
+};
+
+exports.logActivity = asyncHandler(async (req, res) => {
+  const { activity, securityAnalysis } = await recordActivity(req.validatedData, req.ip);
 
   res.status(201).json({
     success: true,
@@ -82,6 +102,50 @@ exports.logActivity = asyncHandler(async (req, res) => {
   });
 });
 
+exports.logActivityBatch = asyncHandler(async (req, res) => {
+  const { activities } = req.validatedData;
+
+  // The batch is stored all or nothing: the agent retries a failed batch as
+  // a whole, so a partially stored one would be recorded twice.
+  const stored = await prisma.$transaction(async (tx) => {
+    const batch = [];
+
+    // Activities are recorded in submission order so the dashboard timeline
+    // matches what the agent observed.
+    for (const data of activities) {
+      batch.push(await storeActivity(tx, data, req.ip));
+    }
+
+    // A delivered batch doubles as a heartbeat so agents can skip the
+    // standalone heartbeat while they are uploading activities.
+    const deviceIds = [...new Set(activities.map(data => data.deviceId))];
+    await tx.device.updateMany({
+      where: { id: { in: deviceIds } },
+      data: { lastSeen: new Date() }
+    });
+
+    return batch;
+  }, { timeout: BATCH_TRANSACTION_TIMEOUT });
+
+  // Failing now would make the agent resend activities that are already stored
+  for (const entry of stored) {
+    try {
+      await announceActivity(entry);
+    } catch (error) {
+      logger.error(`Failed to announce activity ${entry.activity.id}: ${error.message}`);
+    }
+  }
+  const results = stored.map(({ activity }) => activity.id);
+
+  res.status(201).json({
+    success: true,
+    data: {
+      accepted: results.length,
+      ids: results
+    }
+  });
+});
+
 exports.getAllActivities = asyncHandler(async (req, res) => {
   const { page = 1, limit = 50, userId, deviceId, activityType, isSuspicious } = req.query;
 
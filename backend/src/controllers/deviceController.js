@@ -1,3 +1,4 @@
+const crypto = require('crypto');
 const { PrismaClient } = require('@prisma/client');
 const { asyncHandler, AppError } = require('../middleware/errorHandler');
 const logger = require('../utils/logger');
@@ -5,6 +6,15 @@ const { emitToDashboard } = require('../services/socketService');
 
 const prisma = new PrismaClient();
 
+// Agents revalidate the device resource to check its authorization. lastSeen
+// and the activity list change with every heartbeat and upload, so the ETag
+// only covers the authorization fields and a 304 means "authorization
+// unchanged" (a weak validator).
+const authorizationEtag = (device) => {
+  const projection = [device.id, device.userId, device.status, device.isAuthorized].join(':');
+  return `W/"${crypto.createHash('sha256').update(projection).digest('hex').slice(0, 32)}"`;
+};
+
 exports.registerDevice = asyncHandler(async (req, res) => {
   const { email, deviceName, fingerprint, hostname, macAddress, cpuInfo, osInfo, ipAddress } = req.validatedData;
 
@@ -96,6 +106,20 @@ exports.getAllDevices = asyncHandler(async (req, res) => {
 exports.getDeviceById = asyncHandler(async (req, res) => {
   const { id } = req.params;
 
+  const authorization = await prisma.device.findUnique({
+    where: { id },
+    select: { id: true, userId: true, status: true, isAuthorized: true }
+  });
+
+  if (!authorization) {
+    throw new AppError('Device not found', 404);
+  }
+
+  res.set('ETag', authorizationEtag(authorization));
+  if (req.fresh) {
+    return res.status(304).end();
+  }
+
   const device = await prisma.device.findUnique({
     where: { id },
     include: {
@@ -1,3 +1,4 @@
+const crypto = require('crypto');
 const { PrismaClient } = require('@prisma/client');
 const deviceFingerprintService = require('../services/deviceFingerprintService');
 const repositoryIntegrityService = require('../services/repositoryIntegrityService');
@@ -5,12 +6,41 @@ const repositoryProtectionService = require('../services/repositoryProtectionSer
 
 const prisma = new PrismaClient();
 
+/**
+ * How long the agent may reuse a positive decision, and the epoch it belongs to.
+ * Raising ACCESS_DECISION_EPOCH revokes every cached decision on the next refresh.
+ */
+const accessDecisionPolicy = () => ({
+  decisionTtl: parseInt(process.env.ACCESS_DECISION_TTL || '300', 10),
+  revocationEpoch: parseInt(process.env.ACCESS_DECISION_EPOCH || '0', 10)
+});
+
+/**
+ * Sign a positive decision so the agent can cache it without the developer
+ * being able to forge or extend it, or reuse it on another machine: the
+ * claims carry the hash of the fingerprint the agent reported. The token is
+ * base64url(JSON claims) and base64url(Ed25519 signature of the first part),
+ * joined by a dot. Without ACCESS_DECISION_SIGNING_KEY (a PEM private key), or
+ * without a reported fingerprint, no token is issued and agents do not cache
+ * decisions.
+ */
+const signAccessDecision = (claims) => {
+  const signingKey = process.env.ACCESS_DECISION_SIGNING_KEY;
+  if (!signingKey || !claims.fingerprint) {
+    return null;
+  }
+
+  const payload = Buffer.from(JSON.stringify(claims)).toString('base64url');
+  const signature = crypto.sign(null, Buffer.from(payload), signingKey.replace(/\\n/g, '\n'));
+  return `${payload}.${signature.toString('base64url')}`;
+};
+
 /**
  * Verify device access to repository
  */
 exports.verifyRepositoryAccess = async (req, res) => {
   try {
-    const { repositoryId, repositoryPath } = req.body;
+    const { repositoryId, repositoryPath, location, deviceFingerprint } = req.body;
     const userId = req.user.id;
 
     if (!repositoryId || !repositoryPath) {
@@ -30,6 +60,46 @@ exports.verifyRepositoryAccess = async (req, res) => {
       }
     });
 
+    // Copy detected by the agent's local location check (sent by verify-all).
+    // Recorded before the device checks, so a copy made on an unregistered or
+    // unapproved device is reported too.
+    if (location && location.detected) {
+      const activity = await prisma.activity.create({
+        data: {
+          userId,
+          deviceId: device ? device.id : undefined,
+          activityType: 'REPO_COPY',
+          repository: repositoryId,
+          details: {
+            reason: location.reason,
+            actionType: location.action_type,
+            originalLocation: location.original_location,
+            currentLocation: location.current_location || repositoryPath,
+            deviceStatus: device ? device.status : 'NOT_REGISTERED'
+          },
+          isSuspicious: true,
+          riskLevel: 'CRITICAL'
+        }
+      });
+
+      await prisma.alert.create({
+        data: {
+          activityId: activity.id,
+          alertType: 'REPO_COPY_DETECTED',
+          severity: 'CRITICAL',
+          message: location.message || 'Repository copied to unauthorized location',
+          details: location
+        }
+      });
+
+      return res.status(403).json({
+        allowed: false,
+        reason: 'COPY_DETECTED',
+        message: 'Repository copy detected. Access blocked and repository encrypted.',
+        details: location
+      });
+    }
+
     if (!device) {
       // Log the unauthorized access attempt
       await prisma.activity.create({
@@ -151,6 +221,9 @@ exports.verifyRepositoryAccess = async (req, res) => {
       }
     });
 
+    const policy = accessDecisionPolicy();
+    const issuedAt = Math.floor(Date.now() / 1000);
+
     res.json({
       allowed: true,
       message: 'Repository access authorized',
@@ -158,7 +231,19 @@ exports.verifyRepositoryAccess = async (req, res) => {
         id: device.id,
         name: device.deviceName,
         status: device.status
-      }
+      },
+      ...policy,
+      decisionToken: signAccessDecision({
+        repositoryId,
+        repositoryPath,
+        deviceId: device.id,
+        fingerprint: typeof deviceFingerprint === 'string' && deviceFingerprint
+          ? crypto.createHash('sha256').update(deviceFingerprint).digest('hex')
+          : null,
+        issuedAt,
+        expiresAt: issuedAt + policy.decisionTtl,
+        epoch: policy.revocationEpoch
+      })
     });
   } catch (error) {
     console.error('Verify repository access error:', error);
@@ -0,0 +1,56 @@
+// Request encodings express.json() can inflate, advertised to agents per RFC 7694.
+const ACCEPTED_REQUEST_ENCODINGS = 'gzip, deflate';
+const SUPPORTED_BATCH_FORMATS = 'json, interned-v1';
+
+const resolveRefs = (value, strings) => {
+  if (Array.isArray(value)) {
+    return value.map(item => resolveRefs(item, strings));
+  }
+
+  if (value && typeof value === 'object') {
+    const keys = Object.keys(value);
+    if (keys.length === 1 && keys[0] === '$ref' && Number.isInteger(value.$ref)) {
+      return strings[value.$ref];
+    }
+
+    const resolved = {};
+    for (const key of keys) {
+      resolved[key] = resolveRefs(value[key], strings);
+    }
+    return resolved;
+  }
+
+  return value;
+};
+
+// Expands the compact "interned-v1" batch format, where repeated strings are
+// sent once in a string table and referenced as { "$ref": index }.
+const decodeActivityBatch = (req, res, next) => {
+  res.set('Accept-Encoding', ACCEPTED_REQUEST_ENCODINGS);
+  res.set('X-Activity-Formats', SUPPORTED_BATCH_FORMATS);
+
+  const body = req.body || {};
+
+  if (body.format === 'interned-v1') {
+    if (!Array.isArray(body.strings) || !Array.isArray(body.activities)) {
+      res.set('X-Body-Error', 'format.invalid');
+      return res.status(400).json({
+        success: false,
+        message: 'Malformed interned-v1 activity batch'
+      });
+    }
+
+    req.body = { activities: resolveRefs(body.activities, body.strings) };
+  } else if (body.format && body.format !== 'json') {
+    return res.status(415).json({
+      success: false,
+      message: `Unsupported activity batch format: ${body.format}`
+    });
+  }
+
+  next();
+};
+
+module.exports = {
+  decodeActivityBatch
+};
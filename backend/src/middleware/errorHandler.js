@@ -33,6 +33,13 @@ const errorHandler = (err, req, res, next) => {
     });
   }
 
+  // The body could not be read (malformed JSON, undecodable Content-Encoding).
+  // Agents fall back to a plain JSON body on this header; a 400 without it
+  // means the data itself was rejected.
+  if (/^(entity\.parse|encoding|charset)\./.test(err.type || '') || /^Z_/.test(err.code || '')) {
+    res.set('X-Body-Error', err.type || 'encoding.invalid');
+  }
+
   if (err.name === 'ValidationError') {
     const message = Object.values(err.errors).map(val => val.message);
     error = new AppError(message, 400);
@@ -2,9 +2,11 @@ const express = require('express');
 const router = express.Router();
 const activityController = require('../controllers/activityController');
 const { protect, apiKeyAuth } = require('../middleware/auth');
-const { validateRequest, activityLogSchema } = require('../utils/validators');
+const { decodeActivityBatch } = require('../middleware/activityBatchFormat');
+const { validateRequest, activityLogSchema, activityBatchSchema } = require('../utils/validators');
 
 router.post('/', apiKeyAuth, validateRequest(activityLogSchema), activityController.logActivity);
+router.post('/batch', apiKeyAuth, decodeActivityBatch, validateRequest(activityBatchSchema), activityController.logActivityBatch);
 router.get('/', protect, activityController.getAllActivities);
 router.get('/suspicious', protect, activityController.getSuspiciousActivities);
 router.get('/stats', protect, activityController.getActivityStats);
@@ -30,6 +30,10 @@ const activityLogSchema = Joi.object({
   ipAddress: Joi.string().ip().optional()
 });
 
+const activityBatchSchema = Joi.object({
+  activities: Joi.array().items(activityLogSchema).min(1).max(500).required()
+});
+
 const userLoginSchema = Joi.object({
   email: Joi.string().email().required(),
   password: Joi.string().min(1).required()
@@ -67,6 +71,7 @@ const validateRequest = (schema) => {
 module.exports = {
   deviceRegistrationSchema,
   activityLogSchema,
+  activityBatchSchema,
   userLoginSchema,
   userRegistrationSchema,
   validateRequest
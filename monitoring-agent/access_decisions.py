@@ -0,0 +1,195 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Optional
+
+
+DEFAULT_DECISION_FILE = Path.home() / '.devmonitor' / 'decisions.json'
+# Installed by an administrator, outside the developer's reach
+DEFAULT_PUBLIC_KEY_FILE = Path(os.getenv('ACCESS_DECISION_PUBLIC_KEY', '/etc/devmonitor/access-decision.pub'))
+MAX_TTL = 3600
+REFRESH_FRACTION = 0.5
+REFRESH_CLAIM = 30
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+class AccessDecisionCache:
+    """Positive verify-access decisions, cached on disk for offline-fast hooks.
+
+    The backend signs each positive decision (Ed25519) together with the
+    repository ID, path, device ID, fingerprint hash, expiry and revocation
+    epoch it covers. The signed token is kept verbatim and checked against
+    the backend's public key and the local device on every lookup, so a
+    developer can neither forge a decision, extend one, nor use it on
+    another machine. That only holds if they cannot replace the public key file. Without
+    a public key or the cryptography package nothing is cached.
+
+    Tokens are stored under the device fingerprint, repository ID and
+    resolved path. They expire when the backend said (at most MAX_TTL after
+    being issued), and ones issued under an older revocation epoch are
+    dropped as soon as a newer epoch is seen. Denials are never cached.
+    """
+
+    def __init__(self, decision_file: Optional[Path] = None, public_key_file: Optional[Path] = None):
+        self.decision_file = Path(decision_file) if decision_file else DEFAULT_DECISION_FILE
+        self.public_key_file = Path(public_key_file) if public_key_file else DEFAULT_PUBLIC_KEY_FILE
+        self.logger = logging.getLogger(__name__)
+        self.device_id = os.getenv('DEVICE_ID') or None
+        self._public_key = None
+        self._lock = threading.Lock()
+
+    def lookup(self, fingerprint: str, repository_id: str, repo_path) -> Optional[dict]:
+        """Return the claims of the valid decision for this binding, or None"""
+        binding = self._binding(fingerprint, repository_id, repo_path)
+        with self._lock:
+            state = self._read()
+            decision = state['decisions'].get(binding)
+        if not decision:
+            return None
+
+        claims = self._verify(decision.get('token'), fingerprint, repository_id, repo_path)
+        if claims is None:
+            if decision.get('token') and self._public_key is not None:
+                self.logger.warning("Ignoring cached access decision with an invalid signature")
+            return None
+        if claims['epoch'] < state['epoch'] or time.time() >= self._expires_at(claims):
+            return None
+        return claims
+
+    def store(self, fingerprint: str, repository_id: str, repo_path, token) -> Optional[dict]:
+        """Cache a decision token signed by the backend; anything else is not cached"""
+        claims = self._verify(token, fingerprint, repository_id, repo_path)
+        if claims is None:
+            return None
+        now = time.time()
+        expires_at = self._expires_at(claims)
+        if expires_at <= now:
+            return None
+
+        binding = self._binding(fingerprint, repository_id, repo_path)
+        decision = {
+            'token': token,
+            'expires_at': expires_at,
+            'refresh_at': now + (expires_at - now) * REFRESH_FRACTION,
+            'epoch': claims['epoch']
+        }
+
+        with self._lock:
+            state = self._read()
+            if claims['epoch'] > state['epoch']:
+                state['epoch'] = claims['epoch']
+            state['decisions'] = {
+                key: entry for key, entry in state['decisions'].items()
+                if entry.get('epoch', 0) >= state['epoch'] and entry.get('expires_at', 0) > now
+            }
+            state['decisions'][binding] = decision
+            self._write(state)
+        return claims
+
+    def revoke(self, fingerprint: str, repository_id: str, repo_path):
+        binding = self._binding(fingerprint, repository_id, repo_path)
+        with self._lock:
+            state = self._read()
+            if state['decisions'].pop(binding, None):
+                self._write(state)
+
+    def claim_refresh(self, fingerprint: str, repository_id: str, repo_path) -> bool:
+        """True once per REFRESH_CLAIM seconds when a decision is due for refresh.
+
+        Stops every hook run in that window from starting its own refresh.
+        """
+        binding = self._binding(fingerprint, repository_id, repo_path)
+        now = time.time()
+        with self._lock:
+            state = self._read()
+            decision = state['decisions'].get(binding)
+            if not decision or now < decision.get('refresh_at', 0):
+                return False
+            decision['refresh_at'] = now + REFRESH_CLAIM
+            self._write(state)
+        return True
+
+    @staticmethod
+    def _binding(fingerprint: str, repository_id: str, repo_path) -> str:
+        resolved = str(Path(repo_path).resolve())
+        return hashlib.sha256(f'{fingerprint}\0{repository_id}\0{resolved}'.encode()).hexdigest()
+
+    def _verify(self, token, fingerprint: str, repository_id: str, repo_path) -> Optional[dict]:
+        """The token's claims if the backend signed it for this device, repository and path"""
+        try:
+            from cryptography.exceptions import InvalidSignature
+        except ImportError:
+            return None
+        public_key = self._load_public_key()
+        if public_key is None or not isinstance(token, str):
+            return None
+
+        try:
+            payload, signature = token.split('.')
+            public_key.verify(_b64decode(signature), payload.encode())
+            claims = json.loads(_b64decode(payload))
+            if claims['repositoryId'] != repository_id:
+                return None
+            if claims['fingerprint'] != hashlib.sha256(fingerprint.encode()).hexdigest():
+                return None
+            if self.device_id and claims.get('deviceId') != self.device_id:
+                return None
+            if Path(claims['repositoryPath']).resolve() != Path(repo_path).resolve():
+                return None
+            claims['epoch'] = int(claims.get('epoch', 0))
+            claims['issuedAt'] = float(claims['issuedAt'])
+            claims['expiresAt'] = float(claims['expiresAt'])
+        except (InvalidSignature, ValueError, KeyError, TypeError, AttributeError):
+            return None
+        return claims
+
+    @staticmethod
+    def _expires_at(claims: dict) -> float:
+        return min(claims['expiresAt'], claims['issuedAt'] + MAX_TTL)
+
+    def _load_public_key(self):
+        if self._public_key is None:
+            from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+            from cryptography.hazmat.primitives.serialization import load_pem_public_key
+
+            try:
+                with open(self.public_key_file, 'rb') as f:
+                    public_key = load_pem_public_key(f.read())
+            except (OSError, ValueError) as e:
+                self.logger.debug(f"No access decision public key, decisions are not cached: {e}")
+                return None
+            if not isinstance(public_key, Ed25519PublicKey):
+                self.logger.warning(f"{self.public_key_file} is not an Ed25519 public key")
+                return None
+            self._public_key = public_key
+        return self._public_key
+
+    def _read(self) -> dict:
+        try:
+            with open(self.decision_file, 'r') as f:
+                state = json.load(f)
+            return {'epoch': int(state.get('epoch', 0)), 'decisions': dict(state.get('decisions', {}))}
+        except (OSError, ValueError, TypeError, AttributeError):
+            return {'epoch': 0, 'decisions': {}}
+
+    def _write(self, state: dict):
+        try:
+            self.decision_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.decision_file.with_suffix(f'.{os.getpid()}.tmp')
+            with open(tmp_file, 'w') as f:
+                json.dump(state, f)
+            os.chmod(tmp_file, 0o600)
+            os.replace(tmp_file, self.decision_file)
+        except OSError as e:
+            self.logger.debug(f"Could not persist access decisions: {e}")
+
+
+access_decisions = AccessDecisionCache()
@@ -8,14 +8,12 @@ import os
 import sys
 import json
 import time
-import hashlib
-import platform
-import requests
-import subprocess
 from pathlib import Path
 from datetime import datetime
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+
+from device_fingerprint import DeviceFingerprint
+from outbox import http_deliverer, outbox
+from watch_support import EventHandler, watch
 
 
 class GitOperationMonitor:
@@ -31,6 +29,7 @@ class GitOperationMonitor:
             'Authorization': f'Bearer {api_token}'
         }
         self.metadata_file = self.repo_path / '.repo-metadata.json'
+        self.outbox = outbox
         self.metadata = self.load_metadata()
     
     def load_metadata(self):
@@ -64,30 +63,19 @@ class GitOperationMonitor:
                     f.write('\n.repo-metadata.json\n')
     
     def get_device_fingerprint(self):
-        """Generate device fingerprint"""
+        """Get the cached device fingerprint"""
         try:
-            if platform.system() == 'Windows':
-                result = subprocess.run(['getmac'], capture_output=True, text=True)
-                mac_info = result.stdout
-            else:
-                result = subprocess.run(['ifconfig'], capture_output=True, text=True)
-                mac_info = result.stdout
-            
-            device_info = {
-                'hostname': platform.node(),
-                'platform': platform.system(),
-                'arch': platform.machine(),
-                'mac_info': hashlib.sha256(mac_info.encode()).hexdigest()
-            }
-            
-            fingerprint_string = json.dumps(device_info, sort_keys=True)
-            return hashlib.sha256(fingerprint_string.encode()).hexdigest()
+            fingerprint, _ = DeviceFingerprint.generate_host_fingerprint()
+            return fingerprint
         except Exception as e:
             print(f"Error generating fingerprint: {e}")
             return None
     
     def monitor_git_operation(self, operation_type, details=None):
         """Monitor and report git operation to backend"""
+        import requests
+        import transport
+        
         try:
             print(f"\n🔍 Monitoring {operation_type.upper()} operation...")
             
@@ -104,14 +92,14 @@ class GitOperationMonitor:
                 }
             }
             
-            response = requests.post(
+            response = transport.post(
                 f'{self.api_url}/api/access-detection/monitor-operation',
                 headers=self.headers,
-                json=payload,
-                timeout=10
+                json=payload
             )
             
             if response.status_code == 200:
+                self.replay_outbox()
                 result = response.json()
                 if result.get('authorized'):
                     print(f"✅ {operation_type.upper()} operation authorized")
@@ -138,13 +126,38 @@ class GitOperationMonitor:
         except requests.exceptions.RequestException as e:
             print(f"⚠️  Network error: {e}")
             print("   Continuing in offline mode (monitoring only)")
+            self.queue_operation(payload)
             return True
         except Exception as e:
             print(f"⚠️  Error monitoring operation: {e}")
             return True
     
+    def queue_operation(self, payload):
+        """Persist an unreported operation for replay once the backend is back"""
+        try:
+            self.outbox.append('operation', '/api/access-detection/monitor-operation', payload)
+            print("   Operation saved to local outbox for later delivery")
+        except Exception as e:
+            print(f"⚠️  Could not save operation to outbox: {e}")
+    
+    def replay_outbox(self):
+        """Report operations recorded while the backend was unreachable"""
+        import transport
+        
+        try:
+            replayed = self.outbox.replay(
+                http_deliverer(transport.post, self.api_url, self.headers),
+                ['operation']
+            )
+            if replayed:
+                print(f"✅ Reported {replayed} queued operation(s)")
+        except Exception as e:
+            print(f"⚠️  Could not replay queued operations: {e}")
+    
     def check_unauthorized_movement(self):
         """Check if repository has been moved to unauthorized location"""
+        import transport
+        
         try:
             print(f"\n🔍 Checking for unauthorized movement...")
             
@@ -158,11 +171,10 @@ class GitOperationMonitor:
                 }
             }
             
-            response = requests.post(
+            response = transport.post(
                 f'{self.api_url}/api/access-detection/check-movement',
                 headers=self.headers,
-                json=payload,
-                timeout=10
+                json=payload
             )
             
             if response.status_code == 200:
@@ -247,7 +259,7 @@ python3 "{Path(__file__).resolve()}" --monitor-operation pull --repo-id "{self.r
         return True
 
 
-class RepositoryWatcher(FileSystemEventHandler):
+class RepositoryWatcher(EventHandler):
     """Watch repository for suspicious activities"""
     
     def __init__(self, monitor):
@@ -366,19 +378,7 @@ def main():
         print("\n👀 Starting continuous monitoring...")
         print("   Press Ctrl+C to stop\n")
         
-        event_handler = RepositoryWatcher(monitor)
-        observer = Observer()
-        observer.schedule(event_handler, str(monitor.repo_path), recursive=True)
-        observer.start()
-        
-        try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            observer.stop()
-            print("\n\n✋ Monitoring stopped")
-        
-        observer.join()
+        watch(RepositoryWatcher(monitor), monitor.repo_path, stop_message="✋ Monitoring stopped")
     else:
         print("\n💡 Tip: Use --watch to enable continuous monitoring")
         print("💡 Tip: Use --install-hooks to automatically monitor git operations")
@@ -8,10 +8,12 @@ import threading
 from pathlib import Path
 
 import config
-from device_fingerprint import DeviceFingerprint
-from api_client import APIClient
-from git_monitor import GitRepositoryMonitor
-from encryption import RepositoryEncryption
+from api_client import APIClient, PayloadEncoder
+from heartbeat import HeartbeatScheduler
+from outbox import Outbox
+
+# watchdog, GitPython, cryptography and psutil are imported by the commands
+# that use them, so `status` and `register` start quickly. See startup_budget.py.
 
 
 logging.basicConfig(
@@ -32,8 +34,10 @@ class MonitoringAgent:
         self.device_id = None
         self.api_client = None
         self.git_monitor = None
+        self.daemon = None
         self.is_authorized = False
         self.running = False
+        self.stop_event = threading.Event()
 
     def load_config(self):
         if self.config_file.exists():
@@ -58,6 +62,8 @@ class MonitoringAgent:
         logger.info("Configuration saved")
 
     def register_device(self, email, device_name=None):
+        from device_fingerprint import DeviceFingerprint
+
         device_info = DeviceFingerprint.get_device_info()
 
         if not device_name:
@@ -100,69 +106,156 @@ class MonitoringAgent:
             logger.error("API_KEY not configured")
             return False
 
-        self.api_client = APIClient(config.API_URL, config.API_KEY, self.device_id)
-        self.git_monitor = GitRepositoryMonitor(self.api_client)
+        self.api_client = APIClient(
+            config.API_URL,
+            config.API_KEY,
+            self.device_id,
+            batch_size=config.ACTIVITY_BATCH_SIZE,
+            batch_interval=config.ACTIVITY_BATCH_INTERVAL,
+            queue_size=config.ACTIVITY_QUEUE_SIZE,
+            outbox=Outbox(),
+            encoder=PayloadEncoder(config.PAYLOAD_COMPRESSION_THRESHOLD, config.PAYLOAD_COMPACT_FORMAT),
+            device_cache_ttl=config.DEVICE_CACHE_TTL
+        )
 
         return True
 
     def check_authorization(self):
         self.is_authorized = self.api_client.check_device_authorization()
+        logger.debug(f"Device cache hit ratio: {self.api_client.device_cache_hit_ratio():.0%}")
         if not self.is_authorized:
             logger.warning("Device is not authorized. Activities will be logged but may trigger alerts.")
         return self.is_authorized
 
     def heartbeat_loop(self):
-        while self.running:
+        scheduler = HeartbeatScheduler(
+            config.HEARTBEAT_INTERVAL,
+            jitter=config.HEARTBEAT_JITTER,
+            max_backoff=config.HEARTBEAT_MAX_BACKOFF,
+            last_delivery=lambda: self.api_client.batcher.stats['last_delivery_at']
+        )
+
+        delay = scheduler.initial_delay()
+        while not self.stop_event.wait(delay):
             try:
-                self.api_client.send_heartbeat()
+                scheduler.beat(self.api_client.send_heartbeat)
                 self.check_authorization()
             except Exception as e:
                 logger.error(f"Heartbeat failed: {str(e)}")
 
-            time.sleep(config.HEARTBEAT_INTERVAL)
+            delay = scheduler.next_delay()
 
     def start_monitoring(self):
+        from git_monitor import GitRepositoryMonitor
+        from agent_daemon import AgentDaemon
+        from repo_discovery import RepositoryDiscovery
+
+        started_at = time.monotonic()
+
         if not self.initialize():
             sys.exit(1)
 
-        self.check_authorization()
+        self.git_monitor = GitRepositoryMonitor(
+            self.api_client,
+            RepositoryDiscovery(
+                max_depth=config.REPO_DISCOVERY_MAX_DEPTH,
+                workers=config.REPO_DISCOVERY_WORKERS
+            ),
+            dirty_check_options={
+                'quiet_window': config.DIRTY_CHECK_QUIET_WINDOW,
+                'max_delay': config.DIRTY_CHECK_MAX_DELAY,
+                'workers': config.DIRTY_CHECK_WORKERS
+            },
+            watch_mode=config.WATCH_MODE,
+            pipeline_options={
+                'max_size': config.EVENT_QUEUE_SIZE,
+                'workers': config.EVENT_WORKERS,
+                'policy': config.EVENT_OVERFLOW_POLICY
+            },
+            coalescer_options={
+                'quiet_window': config.ACTIVITY_QUIET_WINDOW,
+                'max_window': config.ACTIVITY_MAX_WINDOW
+            }
+        )
 
         self.running = True
+        self.stop_event.clear()
+
+        # The first authorization check and fingerprinting run while the
+        # watchers start, so no filesystem events are missed meanwhile
+        threading.Thread(target=self.startup_authorization, name='startup-authorization', daemon=True).start()
+        threading.Thread(target=self.warm_fingerprint, name='startup-fingerprint', daemon=True).start()
 
         heartbeat_thread = threading.Thread(target=self.heartbeat_loop, daemon=True)
         heartbeat_thread.start()
 
+        self.daemon = AgentDaemon()
+        try:
+            self.daemon.start()
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"Hook daemon not started: {str(e)}")
+            self.daemon = None
+
         logger.info("Monitoring agent started")
         logger.info(f"Device ID: {self.device_id}")
-        logger.info(f"Authorization status: {self.is_authorized}")
 
         monitored_paths = config.MONITORED_PATHS or [str(Path.home())]
 
         try:
-            self.git_monitor.start_monitoring(monitored_paths)
+            self.git_monitor.start_monitoring(monitored_paths, started_at=started_at)
         except KeyboardInterrupt:
             logger.info("Shutting down...")
-            self.running = False
         except Exception as e:
             logger.error(f"Monitoring error: {str(e)}")
+        finally:
             self.running = False
+            self.stop_event.set()
+            if self.daemon:
+                self.daemon.stop()
+            self.api_client.close()
+
+    def startup_authorization(self):
+        try:
+            self.check_authorization()
+            logger.info(f"Authorization status: {self.is_authorized}")
+        except Exception as e:
+            logger.error(f"Authorization check failed: {str(e)}")
+
+    def warm_fingerprint(self):
+        """Compute the fingerprints hook checks need before the first hook arrives"""
+        from device_fingerprint import DeviceFingerprint
+
+        try:
+            DeviceFingerprint.generate_host_fingerprint()
+        except Exception as e:
+            logger.warning(f"Fingerprint warm-up failed: {str(e)}")
 
     def encrypt_unauthorized_repo(self, repo_path):
+        from encryption import RepositoryEncryption
+        from git_refs import ref_resolver
+
         logger.warning(f"Encrypting unauthorized repository: {repo_path}")
+        branch, commit = ref_resolver.resolve(repo_path)
 
         encryption = RepositoryEncryption()
         encrypted_files = encryption.encrypt_repository(repo_path)
 
         logger.info(f"Encrypted {len(encrypted_files)} files in {repo_path}")
 
-        self.api_client.log_activity({
+        activity = {
             'activityType': 'UNAUTHORIZED_ACCESS',
             'repository': os.path.basename(repo_path),
             'details': {
                 'encrypted': True,
                 'files_encrypted': len(encrypted_files)
             }
-        })
+        }
+        # None on a detached HEAD or an unborn branch; the backend rejects null
+        if branch:
+            activity['branch'] = branch
+        if commit:
+            activity['commitHash'] = commit
+        self.api_client.enqueue_activity(activity)
 
     def status(self):
         if not self.initialize():
@@ -0,0 +1,202 @@
+"""
+Agent Daemon
+Answers git hook checks over a Unix domain socket from the long-running agent
+"""
+
+import io
+import os
+import sys
+import json
+import socket
+import socketserver
+import struct
+import threading
+import logging
+from pathlib import Path
+
+from access_detection_agent import GitOperationMonitor
+from copy_detection_monitor import RepositoryCopyDetector
+from repo_protection_agent import RepositoryProtectionAgent
+
+
+DEFAULT_SOCKET_PATH = Path.home() / '.devmonitor' / 'agent.sock'
+MAX_REQUEST_BYTES = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class _ThreadOutput(io.TextIOBase):
+    """sys.stdout replacement that lets each request thread capture its own output.
+
+    The protection agents report through print(), and requests are handled
+    concurrently, so contextlib.redirect_stdout (which is process-wide)
+    cannot be used.
+    """
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        return (buffer or self.fallback).write(text)
+
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.fallback.flush()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        if not self.server.agent_daemon.peer_allowed(self.request):
+            return
+
+        line = self.rfile.readline(MAX_REQUEST_BYTES)
+        try:
+            request = json.loads(line)
+            response = self.server.agent_daemon.dispatch(request)
+        except ValueError:
+            response = {'exit_code': 2, 'output': 'Malformed request\n'}
+
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+else:
+    _UnixServer = None
+
+
+class AgentDaemon:
+    """Runs hook checks inside the resident agent process.
+
+    Imports, the fingerprint cache and pooled backend connections stay warm,
+    so a hook only pays for starting a tiny client and one socket round trip.
+    """
+
+    def __init__(self, socket_path=None):
+        self.socket_path = Path(socket_path) if socket_path else DEFAULT_SOCKET_PATH
+        self.server = None
+        self.output = None
+        self.protection_agents = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        if _UnixServer is None:
+            raise OSError("Unix domain sockets are not supported on this platform")
+
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self._remove_stale_socket()
+
+        old_umask = os.umask(0o177)
+        try:
+            self.server = _UnixServer(str(self.socket_path), _RequestHandler)
+        finally:
+            os.umask(old_umask)
+        self.server.agent_daemon = self
+
+        if not isinstance(sys.stdout, _ThreadOutput):
+            sys.stdout = _ThreadOutput(sys.stdout)
+        self.output = sys.stdout
+
+        threading.Thread(target=self.server.serve_forever, name='agent-daemon', daemon=True).start()
+        logger.info(f"Hook daemon listening on {self.socket_path}")
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _remove_stale_socket(self):
+        if not self.socket_path.exists():
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(self.socket_path))
+        except OSError:
+            self.socket_path.unlink()
+        else:
+            raise RuntimeError(f"Another agent daemon is already listening on {self.socket_path}")
+        finally:
+            probe.close()
+
+    @staticmethod
+    def peer_allowed(connection):
+        """Only answer processes running as the same user as the daemon"""
+        if not hasattr(socket, 'SO_PEERCRED'):
+            return True
+        credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        _, uid, _ = struct.unpack('3i', credentials)
+        return uid == os.getuid()
+
+    def protection_agent(self, api_url, token):
+        with self._lock:
+            key = (api_url, token)
+            if key not in self.protection_agents:
+                self.protection_agents[key] = RepositoryProtectionAgent(api_url, token, resident=True)
+            return self.protection_agents[key]
+
+    def dispatch(self, request):
+        command = request.get('command')
+        handler = getattr(self, f"handle_{str(command).replace('-', '_')}", None) if command else None
+        if handler is None:
+            return {'exit_code': 2, 'output': f'Unknown command: {command}\n'}
+
+        buffer = io.StringIO()
+        self.output.local.buffer = buffer
+        try:
+            exit_code = handler(request)
+        except Exception as e:
+            logger.error(f"Hook request {command} failed: {str(e)}")
+            print(f"❌ Error handling {command}: {e}")
+            exit_code = 1
+        finally:
+            self.output.local.buffer = None
+
+        return {'exit_code': exit_code, 'output': buffer.getvalue()}
+
+    def handle_verify(self, request):
+        agent = self.protection_agent(request['api_url'], request.get('token'))
+        result = agent.verify_repository_access(request['repo_id'], request['repo_path'])
+        if result.get('allowed'):
+            print("\n✓ Access authorized")
+            return 0
+        print(f"\n✗ Access denied: {result.get('message')}")
+        return 1
+
+    def handle_verify_all(self, request):
+        agent = self.protection_agent(request['api_url'], request.get('token'))
+        result = agent.verify_all(request['repo_id'], request['repo_path'])
+        if result.get('allowed'):
+            print("\n✓ Access authorized")
+            return 0
+        print(f"\n✗ Access denied: {result.get('message')}")
+        return 1
+
+    def handle_location(self, request):
+        detector = RepositoryCopyDetector(
+            request['api_url'],
+            request.get('token'),
+            request['repo_path'],
+            request['repo_id']
+        )
+        if detector.verify_and_protect():
+            print("\n✅ Repository access authorized.")
+            return 0
+        print("\n❌ Repository access denied due to unauthorized copy.")
+        return 1
+
+    def handle_operation(self, request):
+        monitor = GitOperationMonitor(
+            request['api_url'],
+            request.get('token'),
+            request['repo_path'],
+            request['repo_id']
+        )
+        return 0 if monitor.monitor_git_operation(request['operation']) else 1
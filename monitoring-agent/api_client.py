@@ -1,24 +1,334 @@
+import gzip
+import json
+import queue
+import threading
+import time
 import requests
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import transport
+from outbox import Outbox, OutboxEntry, is_rejection
+
+
+ACTIVITY_BATCH_ENDPOINT = '/api/activities/batch'
+
+
+class PayloadEncoder:
+    """Encodes request bodies as compactly as the backend accepts.
+
+    Bodies above ``compress_threshold`` bytes are gzip or zstd compressed and
+    activity batches can use the ``interned-v1`` format, which sends repeated
+    strings once. Both are only used after the backend has advertised support
+    for them (``Accept-Encoding`` and ``X-Activity-Formats`` response headers);
+    until then, and for good once an encoded body could not be decoded (415,
+    or 400 with ``X-Body-Error``), bodies are sent as plain JSON.
+    """
+
+    PLAIN_HEADERS = {'Content-Type': 'application/json'}
+
+    def __init__(self, compress_threshold: int = 1024, compact: bool = True):
+        self.compress_threshold = compress_threshold
+        self.compact = compact
+        self.accepted_encodings = set()
+        self.accepted_formats = {'json'}
+        self.downgraded = False
+        self.stats = {'raw_bytes': 0, 'sent_bytes': 0}
+
+    def update_capabilities(self, headers):
+        if self.downgraded:
+            # The backend advertises what it can decode, not what survives the way there
+            return
+        encodings = headers.get('Accept-Encoding')
+        if encodings:
+            self.accepted_encodings = {
+                encoding.split(';')[0].strip().lower() for encoding in encodings.split(',')
+            }
+        formats = headers.get('X-Activity-Formats')
+        if formats:
+            self.accepted_formats = {fmt.strip() for fmt in formats.split(',')}
+
+    def is_plain(self) -> bool:
+        return not self.accepted_encodings and self.accepted_formats == {'json'}
+
+    def downgrade(self):
+        self.accepted_encodings = set()
+        self.accepted_formats = {'json'}
+        self.downgraded = True
+
+    def encode(self, body: Dict, batch: bool = False) -> Tuple[bytes, Dict]:
+        if batch and self.compact and 'interned-v1' in self.accepted_formats:
+            body = self.intern_batch(body['activities'])
+
+        data = json.dumps(body, separators=(',', ':'), default=str).encode()
+        headers = dict(self.PLAIN_HEADERS)
+        self.stats['raw_bytes'] += len(data)
+
+        if len(data) >= self.compress_threshold:
+            if zstandard is not None and 'zstd' in self.accepted_encodings:
+                data = zstandard.ZstdCompressor(level=3).compress(data)
+                headers['Content-Encoding'] = 'zstd'
+            elif 'gzip' in self.accepted_encodings:
+                data = gzip.compress(data, compresslevel=5)
+                headers['Content-Encoding'] = 'gzip'
+
+        self.stats['sent_bytes'] += len(data)
+        return data, headers
+
+    @staticmethod
+    def intern_batch(activities: List[Dict]) -> Dict:
+        counts = {}
+
+        def count(value):
+            if isinstance(value, str):
+                counts[value] = counts.get(value, 0) + 1
+            elif isinstance(value, dict):
+                for item in value.values():
+                    count(item)
+            elif isinstance(value, list):
+                for item in value:
+                    count(item)
+
+        for activity in activities:
+            count(activity)
+
+        # Only strings that repeat and are longer than a reference are worth a
+        # table slot.
+        strings = [value for value, seen in counts.items() if seen > 1 and len(value) > 4]
+        index = {value: position for position, value in enumerate(strings)}
+
+        def replace(value):
+            if isinstance(value, str):
+                position = index.get(value)
+                return value if position is None else {'$ref': position}
+            if isinstance(value, dict):
+                return {key: replace(item) for key, item in value.items()}
+            if isinstance(value, list):
+                return [replace(item) for item in value]
+            return value
+
+        return {
+            'format': 'interned-v1',
+            'strings': strings,
+            'activities': [replace(activity) for activity in activities]
+        }
+
+
+class ActivityBatcher:
+    """Collects activities in a bounded queue and uploads them in bulk.
+
+    A batch is flushed once it holds ``max_batch_size`` activities or its
+    oldest activity is ``max_batch_age`` seconds old, whichever comes first.
+    Batches that cannot be delivered, and activities that do not fit in the
+    queue, are spilled to the outbox and replayed in order later. A batch the
+    backend rejects as invalid is resent one activity at a time and the
+    rejected activities are discarded, so they cannot block the outbox.
+    """
+
+    def __init__(self, api_client, max_batch_size: int = 50, max_batch_age: float = 2.0,
+                 max_queue_size: int = 5000, outbox: Optional[Outbox] = None,
+                 replay_interval: float = 30.0):
+        self.api_client = api_client
+        self.max_batch_size = max_batch_size
+        self.max_batch_age = max_batch_age
+        self.outbox = outbox
+        self.replay_interval = replay_interval
+        self._last_replay = 0.0
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.logger = logging.getLogger(__name__)
+        self.stats = {
+            'enqueued': 0,
+            'dropped': 0,
+            'spilled': 0,
+            'batches_sent': 0,
+            'activities_sent': 0,
+            'failed_batches': 0,
+            'rejected': 0,
+            'last_batch_latency': None,
+            'last_delivery_at': None
+        }
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='activity-batcher', daemon=True)
+            self._thread.start()
+
+    def submit(self, activity_data: Dict) -> bool:
+        self.start()
+        try:
+            self.queue.put_nowait(activity_data)
+        except queue.Full:
+            if self.outbox:
+                self._spill([activity_data])
+                return True
+            self.stats['dropped'] += 1
+            self.logger.warning("Activity queue full, dropping activity")
+            return False
+        self.stats['enqueued'] += 1
+        return True
+
+    def _collect(self) -> List[Dict]:
+        batch = []
+        try:
+            batch.append(self.queue.get(timeout=0.5))
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + self.max_batch_age
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self) -> List[Dict]:
+        batch = []
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _deliver(self, batch: List[Dict]) -> int:
+        """Upload a batch; returns how many leading activities were delivered or rejected"""
+        started = time.monotonic()
+        try:
+            self.api_client.log_activities(batch)
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and is_rejection(e.response.status_code):
+                return self._deliver_each(batch)
+            self.stats['failed_batches'] += 1
+            self.logger.error(f"Failed to deliver batch of {len(batch)} activities: {str(e)}")
+            return 0
+        except Exception as e:
+            self.stats['failed_batches'] += 1
+            self.logger.error(f"Failed to deliver batch of {len(batch)} activities: {str(e)}")
+            return 0
+
+        latency = time.monotonic() - started
+        self.stats['batches_sent'] += 1
+        self.stats['activities_sent'] += len(batch)
+        self.stats['last_batch_latency'] = latency
+        self.stats['last_delivery_at'] = time.time()
+        self.logger.debug(f"Delivered batch of {len(batch)} activities in {latency * 1000:.1f} ms")
+        return len(batch)
+
+    def _deliver_each(self, batch: List[Dict]) -> int:
+        """Find the invalid activities of a rejected batch by uploading them one at a time"""
+        handled = 0
+        for activity_data in batch:
+            try:
+                self.api_client.log_activity(activity_data)
+                self.stats['activities_sent'] += 1
+            except requests.exceptions.HTTPError as e:
+                if e.response is None or not is_rejection(e.response.status_code):
+                    break
+                self.stats['rejected'] += 1
+                self.logger.error(f"Discarding activity rejected by the backend: {str(e)}")
+            except Exception:
+                break
+            handled += 1
+        if handled < len(batch):
+            self.stats['failed_batches'] += 1
+        return handled
+
+    def _deliver_entries(self, entries: List[OutboxEntry]) -> int:
+        return self._deliver([entry.payload for entry in entries])
+
+    def _spill(self, batch: List[Dict]):
+        try:
+            self.outbox.extend('activity', ACTIVITY_BATCH_ENDPOINT, batch)
+            self.stats['spilled'] += len(batch)
+        except Exception as e:
+            self.stats['dropped'] += len(batch)
+            self.logger.error(f"Failed to persist {len(batch)} activities to outbox: {str(e)}")
+
+    def _send(self, batch: List[Dict]):
+        if not self.outbox:
+            self._deliver(batch)
+            return
+
+        # Anything already waiting in the outbox is older than this batch, so
+        # the batch joins the end of the outbox to keep delivery in order.
+        if self.outbox.pending(['activity']):
+            self._spill(batch)
+            self.replay()
+        else:
+            delivered = self._deliver(batch)
+            if delivered < len(batch):
+                self._spill(batch[delivered:])
+
+    def replay(self) -> int:
+        self._last_replay = time.monotonic()
+        if not self.outbox:
+            return 0
+        return self.outbox.replay(self._deliver_entries, ['activity'], self.max_batch_size)
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._send(batch)
+            elif self.outbox and time.monotonic() - self._last_replay >= self.replay_interval:
+                self.replay()
+
+    def flush(self):
+        batch = self._drain()
+        while batch:
+            self._send(batch)
+            batch = self._drain()
+
+    def close(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
 
 
 class APIClient:
-    def __init__(self, api_url: str, api_key: str, device_id: Optional[str] = None):
+    def __init__(self, api_url: str, api_key: str, device_id: Optional[str] = None,
+                 batch_size: int = 50, batch_interval: float = 2.0, queue_size: int = 5000,
+                 outbox: Optional[Outbox] = None, encoder: Optional[PayloadEncoder] = None,
+                 device_cache_ttl: float = 30.0):
         self.api_url = api_url.rstrip('/')
         self.api_key = api_key
         self.device_id = device_id
         self.logger = logging.getLogger(__name__)
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.session = transport.create_session({
             'X-API-Key': api_key,
             'Content-Type': 'application/json'
         })
+        self.outbox = outbox
+        self.batcher = ActivityBatcher(self, batch_size, batch_interval, queue_size, outbox)
+        self.batch_endpoint_available = True
+        self.encoder = encoder or PayloadEncoder()
+        self.device_cache_ttl = device_cache_ttl
+        self.device_cache_stats = {'hits': 0, 'revalidations': 0, 'misses': 0}
+        self._device_cache = None
+        self._device_cache_lock = threading.Lock()
 
     def register_device(self, device_info: Dict) -> Dict:
         try:
-            response = self.session.post(
+            response = transport.post(
                 f'{self.api_url}/api/devices/register',
+                session=self.session,
                 json=device_info
             )
             response.raise_for_status()
@@ -34,16 +344,72 @@ class APIClient:
             return False
 
         try:
-            response = self.session.get(
-                f'{self.api_url}/api/devices/{self.device_id}'
-            )
-            response.raise_for_status()
-            data = response.json()
-            return data.get('data', {}).get('isAuthorized', False)
+            data = self._get_device_resource()
+            return (data or {}).get('isAuthorized', False)
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Failed to check authorization: {str(e)}")
             return False
 
+    def _get_device_resource(self) -> Optional[Dict]:
+        """Return the device resource, cached for ``device_cache_ttl`` seconds.
+
+        Once the TTL expires the cached copy is revalidated with If-None-Match.
+        The backend's ETag only covers the authorization fields, so a device
+        whose authorization is unchanged costs a 304 instead of a full
+        response, even though its ``lastSeen`` moved. If the backend cannot be
+        reached, the stale copy is returned instead.
+        """
+        with self._device_cache_lock:
+            cached = self._device_cache
+            now = time.monotonic()
+
+            if cached and now - cached['fetched_at'] < self.device_cache_ttl:
+                self.device_cache_stats['hits'] += 1
+                return cached['data']
+
+            headers = {}
+            if cached and cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+
+            try:
+                response = transport.get(
+                    f'{self.api_url}/api/devices/{self.device_id}',
+                    session=self.session,
+                    headers=headers
+                )
+            except requests.exceptions.RequestException as e:
+                # While the backend is unreachable or its circuit is open the
+                # last known device state is the best available decision.
+                if cached:
+                    self.logger.warning(f"Using cached device state: {str(e)}")
+                    return cached['data']
+                raise
+
+            if response.status_code == 304 and cached:
+                cached['fetched_at'] = now
+                self.device_cache_stats['revalidations'] += 1
+                return cached['data']
+
+            response.raise_for_status()
+            data = response.json().get('data')
+            self._device_cache = {
+                'data': data,
+                'etag': response.headers.get('ETag'),
+                'fetched_at': now
+            }
+            self.device_cache_stats['misses'] += 1
+            return data
+
+    def device_cache_hit_ratio(self) -> float:
+        """Share of device lookups answered without a full response body."""
+        stats = self.device_cache_stats
+        total = stats['hits'] + stats['revalidations'] + stats['misses']
+        return (stats['hits'] + stats['revalidations']) / total if total else 0.0
+
+    def invalidate_device_cache(self):
+        with self._device_cache_lock:
+            self._device_cache = None
+
     def log_activity(self, activity_data: Dict) -> Dict:
         if not self.device_id:
             raise ValueError("Device not registered")
@@ -51,23 +417,96 @@ class APIClient:
         activity_data['deviceId'] = self.device_id
 
         try:
-            response = self.session.post(
-                f'{self.api_url}/api/activities',
-                json=activity_data
-            )
+            response = self._post_encoded('/api/activities', activity_data)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Failed to log activity: {str(e)}")
             raise
 
+    def log_activities(self, activities: List[Dict]) -> Dict:
+        if not self.device_id:
+            raise ValueError("Device not registered")
+
+        for activity_data in activities:
+            activity_data['deviceId'] = self.device_id
+
+        if self.batch_endpoint_available:
+            try:
+                response = self._post_encoded(
+                    ACTIVITY_BATCH_ENDPOINT,
+                    {'activities': activities},
+                    batch=True
+                )
+                if not self._route_missing(response):
+                    response.raise_for_status()
+                    return response.json()
+            except requests.exceptions.RequestException as e:
+                self.logger.error(f"Failed to log activity batch: {str(e)}")
+                raise
+
+            self.logger.warning("Batch endpoint not available, falling back to single uploads")
+            self.batch_endpoint_available = False
+
+        for activity_data in activities:
+            self.log_activity(activity_data)
+        return {'success': True, 'data': {'accepted': len(activities)}}
+
+    @staticmethod
+    def _route_missing(response) -> bool:
+        """Whether the backend has no such route, as opposed to a 404 from the handler"""
+        if response.status_code == 405:
+            return True
+        if response.status_code != 404:
+            return False
+        # Application errors carry a JSON error body; an unknown route gets
+        # the framework's default page
+        try:
+            body = response.json()
+        except ValueError:
+            return True
+        return not (isinstance(body, dict) and 'error' in body)
+
+    def _post_encoded(self, path: str, body: Dict, batch: bool = False):
+        data, headers = self.encoder.encode(body, batch)
+        response = transport.post(f'{self.api_url}{path}', session=self.session,
+                                  data=data, headers=headers)
+
+        # A body the backend could not decode is retried once as plain JSON and
+        # the client stops using the negotiated encodings. Other 400s reject
+        # the data itself and would fail again.
+        undecodable = response.status_code == 415 or (
+            response.status_code == 400 and response.headers.get('X-Body-Error'))
+        if undecodable and not self.encoder.is_plain():
+            self.logger.warning("Backend rejected encoded payload, falling back to plain JSON")
+            self.encoder.downgrade()
+            data, headers = self.encoder.encode(body, batch)
+            response = transport.post(f'{self.api_url}{path}', session=self.session,
+                                      data=data, headers=headers)
+
+        self.encoder.update_capabilities(response.headers)
+        return response
+
+    def enqueue_activity(self, activity_data: Dict) -> bool:
+        """Queue an activity for batched delivery without blocking the caller."""
+        if not self.device_id:
+            raise ValueError("Device not registered")
+        return self.batcher.submit(activity_data)
+
+    def close(self):
+        self.batcher.close()
+        if self.outbox:
+            self.outbox.close()
+        self.session.close()
+
     def send_heartbeat(self) -> bool:
         if not self.device_id:
             return False
 
         try:
-            response = self.session.post(
-                f'{self.api_url}/api/devices/{self.device_id}/heartbeat'
+            response = transport.post(
+                f'{self.api_url}/api/devices/{self.device_id}/heartbeat',
+                session=self.session
             )
             response.raise_for_status()
             return True
@@ -80,11 +519,7 @@ class APIClient:
             return None
 
         try:
-            response = self.session.get(
-                f'{self.api_url}/api/devices/{self.device_id}'
-            )
-            response.raise_for_status()
-            return response.json().get('data')
+            return self._get_device_resource()
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Failed to get device info: {str(e)}")
             return None
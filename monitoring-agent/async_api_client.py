@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Async API Client
+asyncio counterpart of APIClient with pooled keep-alive connections
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+import aiohttp
+
+
+class AsyncAPIClient:
+    """Same surface as APIClient, but every call is a coroutine on one event loop.
+
+    Connections are pooled and kept alive by a shared connector, at most
+    ``max_in_flight`` requests run at once and each call has its own timeout.
+    """
+
+    def __init__(self, api_url: str, api_key: str, device_id: Optional[str] = None,
+                 max_in_flight: int = 10, pool_size: int = 10, timeout: float = 10.0,
+                 keepalive_timeout: float = 30.0):
+        self.api_url = api_url.rstrip('/')
+        self.api_key = api_key
+        self.device_id = device_id
+        self.max_in_flight = max_in_flight
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.logger = logging.getLogger(__name__)
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={
+                    'X-API-Key': self.api_key,
+                    'Content-Type': 'application/json'
+                }
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._session
+
+    async def _request(self, method: str, path: str, json_body: Optional[Dict] = None,
+                       timeout: Optional[float] = None) -> Dict:
+        session = self._get_session()
+        client_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+
+        async with self._semaphore:
+            async with session.request(method, f'{self.api_url}{path}', json=json_body,
+                                       timeout=client_timeout) as response:
+                response.raise_for_status()
+                if response.content_length == 0:
+                    return {}
+                return await response.json(content_type=None) or {}
+
+    async def register_device(self, device_info: Dict) -> Dict:
+        try:
+            data = await self._request('POST', '/api/devices/register', device_info)
+            self.logger.info("Device registered successfully")
+            return data
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"Failed to register device: {str(e)}")
+            raise
+
+    async def check_device_authorization(self) -> bool:
+        if not self.device_id:
+            return False
+
+        try:
+            data = await self._request('GET', f'/api/devices/{self.device_id}')
+            return data.get('data', {}).get('isAuthorized', False)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"Failed to check authorization: {str(e)}")
+            return False
+
+    async def log_activity(self, activity_data: Dict) -> Dict:
+        if not self.device_id:
+            raise ValueError("Device not registered")
+
+        activity_data['deviceId'] = self.device_id
+
+        try:
+            return await self._request('POST', '/api/activities', activity_data)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"Failed to log activity: {str(e)}")
+            raise
+
+    async def send_heartbeat(self) -> bool:
+        if not self.device_id:
+            return False
+
+        try:
+            await self._request('POST', f'/api/devices/{self.device_id}/heartbeat')
+            return True
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"Failed to send heartbeat: {str(e)}")
+            return False
+
+    async def get_device_info(self) -> Optional[Dict]:
+        if not self.device_id:
+            return None
+
+        try:
+            data = await self._request('GET', f'/api/devices/{self.device_id}')
+            return data.get('data')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"Failed to get device info: {str(e)}")
+            return None
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+def start_stand_in_server(latency: float = 0.005):
+    """Start a local HTTP server that mimics the device and activity endpoints."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    device = {'id': 'benchmark-device', 'isAuthorized': True, 'status': 'APPROVED'}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _reply(self, status, body):
+            time.sleep(latency)
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self._reply(200, {'success': True, 'data': device})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                self.rfile.read(length)
+            self._reply(201, {'success': True, 'data': device})
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def benchmark(requests_count: int = 200, concurrency: int = 10, latency: float = 0.005):
+    """Compare the sync APIClient with AsyncAPIClient against the stand-in server."""
+    import tempfile
+    from pathlib import Path
+
+    import transport
+    from api_client import APIClient
+
+    server = start_stand_in_server(latency)
+    api_url = f'http://127.0.0.1:{server.server_address[1]}'
+    activity = {'activityType': 'GIT_COMMIT', 'repository': 'benchmark'}
+
+    # Keep the stand-in server's circuit out of ~/.devmonitor/circuit.json
+    state_file = transport.BREAKER_STATE_FILE
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        transport.BREAKER_STATE_FILE = Path(tmp_dir) / 'circuit.json'
+        try:
+            sync_client = APIClient(api_url, 'benchmark', 'benchmark-device')
+            started = time.perf_counter()
+            for _ in range(requests_count):
+                sync_client.log_activity(dict(activity))
+            sync_elapsed = time.perf_counter() - started
+            sync_client.session.close()
+        finally:
+            transport.BREAKER_STATE_FILE = state_file
+
+    async def run_async():
+        async with AsyncAPIClient(api_url, 'benchmark', 'benchmark-device',
+                                  max_in_flight=concurrency, pool_size=concurrency) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(client.log_activity(dict(activity)) for _ in range(requests_count)))
+            return time.perf_counter() - started
+
+    async_elapsed = asyncio.run(run_async())
+    server.shutdown()
+
+    print(f"Requests:      {requests_count} (server latency {latency * 1000:.1f} ms)")
+    print(f"APIClient:     {sync_elapsed:.3f} s ({requests_count / sync_elapsed:.0f} req/s)")
+    print(f"AsyncAPIClient: {async_elapsed:.3f} s ({requests_count / async_elapsed:.0f} req/s, "
+          f"{concurrency} in flight)")
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark AsyncAPIClient against APIClient')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per client')
+    parser.add_argument('--concurrency', type=int, default=10, help='Async requests in flight')
+    parser.add_argument('--latency', type=float, default=5.0, help='Stand-in server latency (ms)')
+
+    args = parser.parse_args()
+    benchmark(args.requests, args.concurrency, args.latency / 1000)
+
+
+if __name__ == '__main__':
+    main()
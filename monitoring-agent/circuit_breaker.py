@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Optional
+
+import requests
+
+
+DEFAULT_STATE_FILE = Path.home() / '.devmonitor' / 'circuit.json'
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling a backend whose circuit is open.
+
+    It is a ConnectionError so existing offline handling applies unchanged.
+    """
+
+
+class CircuitBreaker:
+    """Stops calling a failing backend until it has had time to recover.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail immediately. After ``reset_timeout`` seconds one probe call is
+    let through (half-open). If it succeeds the circuit closes again,
+    otherwise it reopens. Each git hook runs in a new process, so the state
+    is also stored in ``state_file``. That way a hook fails fast when an
+    earlier process has already found the backend down. The file is only
+    parsed again when it changed.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0,
+                 state_file: Optional[Path] = DEFAULT_STATE_FILE):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state_file = Path(state_file) if state_file else None
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._probe_in_flight = False
+        self._loaded_signature = None
+        self._load()
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may be attempted now."""
+        with self._lock:
+            self._load()
+            if self.state == CLOSED:
+                return
+
+            if self.state == OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+
+            raise CircuitOpenError(f"Circuit for {self.name} is open, backend calls suspended")
+
+    def is_open(self) -> bool:
+        """Whether calls are currently suspended, e.g. by another process"""
+        with self._lock:
+            self._load()
+            return self.state == OPEN
+
+    def release(self):
+        """Free the probe slot of a call that ended without a verdict."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            changed = self.state != CLOSED or self.failures
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+            if changed:
+                self._save()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+                self.state = OPEN
+                self.opened_at = time.time()
+                self._probe_in_flight = False
+            self._save()
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.state_file)
+        except OSError:
+            return None
+        # Saves replace the file, so the inode changes even within one mtime tick
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        if not self.state_file:
+            return
+        signature = self._signature()
+        if signature is None or signature == self._loaded_signature:
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                entry = json.load(f).get(self.name)
+        except (OSError, ValueError):
+            return
+        self._loaded_signature = signature
+        if entry:
+            self.state = entry.get('state', CLOSED)
+            self.failures = entry.get('failures', 0)
+            self.opened_at = entry.get('opened_at', 0.0)
+
+    def _save(self):
+        if not self.state_file:
+            return
+        try:
+            try:
+                with open(self.state_file, 'r') as f:
+                    states = json.load(f)
+            except (OSError, ValueError):
+                states = {}
+            states[self.name] = {
+                'state': self.state,
+                'failures': self.failures,
+                'opened_at': self.opened_at
+            }
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.state_file.with_suffix(f'.{os.getpid()}.tmp')
+            with open(tmp_file, 'w') as f:
+                json.dump(states, f)
+            os.replace(tmp_file, self.state_file)
+            self._loaded_signature = self._signature()
+        except OSError as e:
+            self.logger.debug(f"Could not persist circuit state: {e}")
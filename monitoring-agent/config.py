@@ -10,3 +10,22 @@ USER_EMAIL = os.getenv('USER_EMAIL', '')
 HEARTBEAT_INTERVAL = int(os.getenv('HEARTBEAT_INTERVAL', '60'))
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 MONITORED_PATHS = os.getenv('MONITORED_PATHS', '').split(',') if os.getenv('MONITORED_PATHS') else []
+ACTIVITY_BATCH_SIZE = int(os.getenv('ACTIVITY_BATCH_SIZE', '50'))
+ACTIVITY_BATCH_INTERVAL = float(os.getenv('ACTIVITY_BATCH_INTERVAL', '2'))
+ACTIVITY_QUEUE_SIZE = int(os.getenv('ACTIVITY_QUEUE_SIZE', '5000'))
+PAYLOAD_COMPRESSION_THRESHOLD = int(os.getenv('PAYLOAD_COMPRESSION_THRESHOLD', '1024'))
+PAYLOAD_COMPACT_FORMAT = os.getenv('PAYLOAD_COMPACT_FORMAT', 'true').lower() == 'true'
+DEVICE_CACHE_TTL = float(os.getenv('DEVICE_CACHE_TTL', '30'))
+HEARTBEAT_JITTER = float(os.getenv('HEARTBEAT_JITTER', '0.2'))
+HEARTBEAT_MAX_BACKOFF = float(os.getenv('HEARTBEAT_MAX_BACKOFF', '8'))
+REPO_DISCOVERY_MAX_DEPTH = int(os.getenv('REPO_DISCOVERY_MAX_DEPTH', '8'))
+REPO_DISCOVERY_WORKERS = int(os.getenv('REPO_DISCOVERY_WORKERS', '16'))
+DIRTY_CHECK_QUIET_WINDOW = float(os.getenv('DIRTY_CHECK_QUIET_WINDOW', '2'))
+DIRTY_CHECK_MAX_DELAY = float(os.getenv('DIRTY_CHECK_MAX_DELAY', '30'))
+DIRTY_CHECK_WORKERS = int(os.getenv('DIRTY_CHECK_WORKERS', '2'))
+WATCH_MODE = os.getenv('WATCH_MODE', 'recursive')
+EVENT_QUEUE_SIZE = int(os.getenv('EVENT_QUEUE_SIZE', '10000'))
+EVENT_WORKERS = int(os.getenv('EVENT_WORKERS', '2'))
+EVENT_OVERFLOW_POLICY = os.getenv('EVENT_OVERFLOW_POLICY', 'block')
+ACTIVITY_QUIET_WINDOW = float(os.getenv('ACTIVITY_QUIET_WINDOW', '2'))
+ACTIVITY_MAX_WINDOW = float(os.getenv('ACTIVITY_MAX_WINDOW', '30'))
@@ -8,13 +8,14 @@ import os
 import sys
 import json
 import time
-import hashlib
-import platform
-import requests
+import _thread
 from pathlib import Path
 from datetime import datetime
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+
+from device_fingerprint import DeviceFingerprint
+from event_pipeline import EventPipeline, POLICY_DROP
+from outbox import http_deliverer, outbox
+from watch_support import EventHandler, watch
 
 class RepositoryCopyDetector:
     def __init__(self, api_url, api_token, repo_path, repo_id):
@@ -28,6 +29,7 @@ class RepositoryCopyDetector:
         }
         self.trusted_paths = []
         self.original_location = None
+        self.outbox = outbox
         self.load_repository_metadata()
     
     def load_repository_metadata(self):
@@ -69,27 +71,9 @@ class RepositoryCopyDetector:
                     f.write('\n.repo-metadata.json\n')
     
     def get_device_fingerprint(self):
-        """Generate device fingerprint"""
-        import subprocess
-        
+        """Get the cached device fingerprint"""
         try:
-            if platform.system() == 'Windows':
-                result = subprocess.run(['getmac'], capture_output=True, text=True)
-                mac_info = result.stdout
-            else:
-                result = subprocess.run(['ifconfig'], capture_output=True, text=True)
-                mac_info = result.stdout
-            
-            device_info = {
-                'hostname': platform.node(),
-                'platform': platform.system(),
-                'arch': platform.machine(),
-                'mac_info': hashlib.sha256(mac_info.encode()).hexdigest()
-            }
-            
-            fingerprint_string = json.dumps(device_info, sort_keys=True)
-            fingerprint = hashlib.sha256(fingerprint_string.encode()).hexdigest()
-            
+            fingerprint, _ = DeviceFingerprint.generate_host_fingerprint()
             return fingerprint
         except Exception as e:
             print(f"Error generating fingerprint: {e}")
@@ -143,36 +127,99 @@ class RepositoryCopyDetector:
                     detection_details['message'] = 'Repository appears to be moved (original no longer exists)'
                 
                 return detection_details
-        
+        else:
+            # Metadata written here on first run; the content may still be a copy
+            identity_match = self.identity_match()
+            if identity_match:
+                return identity_match
+
         return {
             'detected': False,
             'reason': 'AUTHORIZED_LOCATION'
         }
+
+    def identity_match(self):
+        """Check the agent's copy index for a copy that lost its .repo-metadata.json"""
+        from copy_index import copy_index
+
+        match = copy_index.check(str(self.repo_path))
+        if not match:
+            return None
+
+        detection_details = {
+            'detected': True,
+            'reason': 'IDENTITY_MATCH',
+            'original_location': match['original'],
+            'current_location': str(self.repo_path),
+            'matched_on': match['matched_on'],
+            'risk_level': 'CRITICAL'
+        }
+        if match['match'] == 'copy':
+            detection_details['action_type'] = 'COPY'
+            detection_details['message'] = 'Repository content matches a repository at another location'
+        else:
+            detection_details['action_type'] = 'MOVE'
+            detection_details['message'] = 'Repository content matches a repository that no longer exists'
+        return detection_details
+    
+    def alert_payload(self, alert_data):
+        """Dashboard alert for a copy detection"""
+        return {
+            'severity': 'CRITICAL',
+            'message': alert_data.get('message', 'Repository copy detected'),
+            'details': alert_data,
+            'activityType': 'COPY_DETECTED'
+        }
     
     def send_alert(self, alert_data):
-        """Send alert to backend"""
+        """Send alert to backend, keeping it in the outbox if delivery fails"""
+        import transport
+        
+        payload = self.alert_payload(alert_data)
+        
         try:
-            response = requests.post(
+            response = transport.post(
                 f'{self.api_url}/api/alerts',
                 headers=self.headers,
-                json={
-                    'severity': 'CRITICAL',
-                    'message': alert_data.get('message', 'Repository copy detected'),
-                    'details': alert_data,
-                    'activityType': 'COPY_DETECTED'
-                }
+                json=payload
             )
             
             if response.status_code in [200, 201]:
                 print(f"✓ Alert sent to dashboard")
+                self.replay_outbox()
                 return True
             else:
                 print(f"✗ Failed to send alert: {response.status_code}")
+                if response.status_code >= 500:
+                    self.queue_alert(payload)
                 return False
         except Exception as e:
             print(f"✗ Error sending alert: {e}")
+            self.queue_alert(payload)
             return False
     
+    def queue_alert(self, payload):
+        """Persist an undelivered alert for later replay"""
+        try:
+            self.outbox.append('alert', '/api/alerts', payload)
+            print("  Alert saved to local outbox for later delivery")
+        except Exception as e:
+            print(f"✗ Could not save alert to outbox: {e}")
+    
+    def replay_outbox(self):
+        """Deliver alerts saved while the backend was unreachable"""
+        import transport
+        
+        try:
+            replayed = self.outbox.replay(
+                http_deliverer(transport.post, self.api_url, self.headers),
+                ['alert']
+            )
+            if replayed:
+                print(f"✓ Delivered {replayed} queued alert(s)")
+        except Exception as e:
+            print(f"Note: Could not replay queued alerts: {e}")
+    
     def encrypt_repository(self):
         """Encrypt repository on unauthorized copy"""
         try:
@@ -247,7 +294,8 @@ class RepositoryCopyDetector:
             
             # Notify backend to encrypt
             try:
-                requests.post(
+                import transport
+                transport.post(
                     f'{self.api_url}/api/repository-protection/verify-access',
                     headers=self.headers,
                     json={
@@ -264,23 +312,29 @@ class RepositoryCopyDetector:
             print(f"  Location: Authorized")
             return True
 
-class RepositoryWatcher(FileSystemEventHandler):
+class RepositoryWatcher(EventHandler):
     """Watch for repository being copied"""
     
     def __init__(self, detector):
         self.detector = detector
         self.last_check = time.time()
+        self.blocked = False
+        # One pending check is enough; further triggers while it waits are redundant
+        self.checks = EventPipeline(self.run_check, name='copy-checks', max_size=1, workers=1, policy=POLICY_DROP)
     
     def on_any_event(self, event):
         # Check every 5 seconds to avoid too frequent checks
         current_time = time.time()
         if current_time - self.last_check > 5:
             self.last_check = current_time
-            
-            # Check if repository was moved/copied
-            if not self.detector.verify_and_protect():
-                print("Repository access has been blocked. Exiting...")
-                sys.exit(1)
+            self.checks.submit(event.src_path)
+    
+    def run_check(self, path):
+        # Fingerprinting and backend calls stay off the observer thread
+        if not self.detector.verify_and_protect():
+            print("Repository access has been blocked. Exiting...")
+            self.blocked = True
+            _thread.interrupt_main()
 
 def main():
     """Main function"""
@@ -342,19 +396,11 @@ def main():
         print("\n👀 Starting continuous monitoring...")
         print("   Press Ctrl+C to stop\n")
         
-        event_handler = RepositoryWatcher(detector)
-        observer = Observer()
-        observer.schedule(event_handler, str(detector.repo_path), recursive=True)
-        observer.start()
-        
-        try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            observer.stop()
-            print("\n\nMonitoring stopped.")
-        
-        observer.join()
+        watcher = RepositoryWatcher(detector)
+        watch(watcher, detector.repo_path, stop_message="Monitoring stopped.")
+        watcher.checks.close()
+        if watcher.blocked:
+            sys.exit(1)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+from git_refs import resolve_git_dirs
+from reflog_tailer import REFLOG_LINE
+
+
+DEFAULT_INDEX_FILE = Path.home() / '.devmonitor' / 'copy_index.db'
+
+# A shared origin or packs mean a copy of the same clone; a shared remote
+# only means two clones of the same project and is reported as evidence
+KEYS = ('origin', 'packs', 'remote', 'inode')
+
+REMOTE_URL = re.compile(r'^\s*url\s*=\s*(.+?)\s*$')
+
+
+def repository_identity(repo_path: str) -> Optional[Dict[str, Optional[str]]]:
+    """Content identity of a repository, read from its git dir without running git.
+
+    - ``origin``: hash of the first reflog entry (commit, author, time and
+      message), written when the repository was cloned or created.
+      Independent clones differ (unless one user cloned the same remote
+      twice within a second), a ``cp -r`` copy keeps it verbatim. It
+      stands in for the root commit, which cannot be found without walking
+      the history.
+    - ``packs``: hash of the packfile names and sizes
+    - ``remote``: normalized URL of the ``origin`` remote
+    - ``inode``: device and inode of the git dir; unchanged by a move on
+      the same filesystem, new for a copy
+    """
+    try:
+        git_dir, common_dir = resolve_git_dirs(repo_path)
+        git_dir_stat = os.stat(git_dir)
+    except OSError:
+        return None
+
+    identity = {'origin': None, 'packs': None, 'remote': None,
+                'inode': f'{git_dir_stat.st_dev}:{git_dir_stat.st_ino}'}
+
+    try:
+        with open(os.path.join(git_dir, 'logs', 'HEAD'), 'r', errors='replace') as f:
+            first_entry = f.readline().rstrip('\n')
+        if REFLOG_LINE.match(first_entry):
+            identity['origin'] = hashlib.sha1(first_entry.encode()).hexdigest()[:20]
+    except OSError:
+        pass
+
+    # Worktrees share their main repository's objects, so packs say nothing
+    if git_dir == common_dir:
+        try:
+            with os.scandir(os.path.join(common_dir, 'objects', 'pack')) as entries:
+                packs = sorted(f'{entry.name}:{entry.stat().st_size}'
+                               for entry in entries if entry.name.endswith('.pack'))
+            if packs:
+                identity['packs'] = hashlib.sha1('\n'.join(packs).encode()).hexdigest()[:20]
+        except OSError:
+            pass
+
+    identity['remote'] = _origin_remote(os.path.join(common_dir, 'config'))
+    return identity
+
+
+def _origin_remote(config_path: str) -> Optional[str]:
+    try:
+        with open(config_path, 'r', errors='replace') as f:
+            in_origin = False
+            for line in f:
+                stripped = line.strip()
+                if stripped.startswith('['):
+                    in_origin = stripped.replace(' ', '') == '[remote"origin"]'
+                elif in_origin:
+                    match = REMOTE_URL.match(line)
+                    if match:
+                        url = match.group(1).rstrip('/')
+                        return url[:-len('.git')] if url.endswith('.git') else url
+    except OSError:
+        pass
+    return None
+
+
+class CopyIndex:
+    """Identity index of every monitored repository, for copy detection.
+
+    Each repository is indexed by the keys of ``repository_identity`` in a
+    SQLite database (``~/.devmonitor/copy_index.db``) with an index on
+    (key, value). Whether a newly seen ``.git`` is a copy or a move of a
+    known repository is answered with a few indexed queries, without loading
+    the index, so a short-lived hook or CLI process pays the same as the
+    agent. The agent keeps it up to date as repositories are discovered.
+
+    ``git reflog expire`` and gc drop the first reflog entry, so every
+    ``origin`` a repository had is kept; copies made before and after a gc
+    both match. Repositories found to be copies stay marked as such.
+    """
+
+    def __init__(self, path: Optional[Path] = DEFAULT_INDEX_FILE):
+        self.path = Path(path) if path else None
+        self.logger = logging.getLogger(__name__)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path) if self.path else ':memory:', timeout=5,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS repositories ('
+                ' path TEXT PRIMARY KEY,'
+                ' indexed_at REAL NOT NULL,'
+                ' copy_of TEXT,'
+                ' matched_on TEXT)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS identities ('
+                ' key TEXT NOT NULL,'
+                ' value TEXT NOT NULL,'
+                ' path TEXT NOT NULL,'
+                ' PRIMARY KEY (key, value, path)) WITHOUT ROWID'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS identities_path ON identities (path)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def check(self, repo_path: str, identity: Optional[dict] = None) -> Optional[dict]:
+        """Classify a repository without changing the index.
+
+        Returns None, or ``{'match': 'copy'|'move', 'original': path,
+        'matched_on': [keys]}``.
+        """
+        repo_path = os.path.normpath(repo_path)
+        identity = identity or repository_identity(repo_path)
+        if identity is None:
+            return None
+        with self._lock:
+            conn = self._connection()
+            entry = self._entry(conn, repo_path)
+            if entry is not None and entry[1]:
+                return {'match': 'copy', 'original': entry[1], 'matched_on': json.loads(entry[2] or '[]')}
+            if entry is not None:
+                return None
+            return self._classify(conn, repo_path, identity)
+
+    def add(self, repo_path: str) -> Optional[dict]:
+        """Index a repository; returns its classification if it is newly seen as a copy or move"""
+        repo_path = os.path.normpath(repo_path)
+        identity = repository_identity(repo_path)
+        if identity is None:
+            return None
+
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                if self._entry(conn, repo_path) is not None:
+                    # Fetches and gc change the packs; it is still the same repository
+                    self._set_identity(conn, repo_path, identity)
+                    return None
+
+                result = self._classify(conn, repo_path, identity, drop_stale=True)
+                if result and result['match'] == 'move':
+                    # Same repository at a new path
+                    original = result['original']
+                    conn.execute('UPDATE repositories SET path = ? WHERE path = ?', (repo_path, original))
+                    conn.execute('UPDATE identities SET path = ? WHERE path = ?', (repo_path, original))
+                    conn.execute('UPDATE repositories SET copy_of = ? WHERE copy_of = ?', (repo_path, original))
+                elif result:
+                    conn.execute(
+                        'INSERT INTO repositories (path, indexed_at, copy_of, matched_on) VALUES (?, ?, ?, ?)',
+                        (repo_path, time.time(), result['original'], json.dumps(result['matched_on']))
+                    )
+                else:
+                    conn.execute('INSERT INTO repositories (path, indexed_at) VALUES (?, ?)',
+                                 (repo_path, time.time()))
+                self._set_identity(conn, repo_path, identity)
+            return result
+
+    def remove(self, repo_path: str):
+        repo_path = os.path.normpath(repo_path)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                self._delete(conn, repo_path)
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, repo_path: str):
+        conn.execute('DELETE FROM repositories WHERE path = ?', (repo_path,))
+        conn.execute('DELETE FROM identities WHERE path = ?', (repo_path,))
+
+    @staticmethod
+    def _entry(conn: sqlite3.Connection, repo_path: str):
+        return conn.execute('SELECT indexed_at, copy_of, matched_on FROM repositories WHERE path = ?',
+                            (repo_path,)).fetchone()
+
+    @staticmethod
+    def _set_identity(conn: sqlite3.Connection, repo_path: str, identity: dict):
+        # Every origin is kept, the other keys describe the repository as it is now
+        conn.execute("DELETE FROM identities WHERE path = ? AND key != 'origin'", (repo_path,))
+        conn.executemany(
+            'INSERT OR IGNORE INTO identities (key, value, path) VALUES (?, ?, ?)',
+            [(key, identity[key], repo_path) for key in KEYS if identity[key]]
+        )
+
+    @staticmethod
+    def _paths(conn: sqlite3.Connection, key: str, value: str, repo_path: str):
+        rows = conn.execute('SELECT path FROM identities WHERE key = ? AND value = ? AND path != ?',
+                            (key, value, repo_path))
+        return [row[0] for row in rows]
+
+    def _classify(self, conn: sqlite3.Connection, repo_path: str, identity: dict,
+                  drop_stale: bool = False) -> Optional[dict]:
+        matches = {}
+        for key in KEYS:
+            if key == 'inode' or not identity[key]:
+                continue
+            for candidate in self._paths(conn, key, identity[key], repo_path):
+                matches.setdefault(candidate, []).append(key)
+
+        for candidate in self._paths(conn, 'inode', identity['inode'], repo_path):
+            if os.path.exists(candidate):
+                continue
+            if candidate in matches:
+                return {'match': 'move', 'original': candidate, 'matched_on': ['inode'] + matches[candidate]}
+            # Deleted while nothing watched, and its inode reused by an unrelated repository
+            if drop_stale:
+                self._delete(conn, candidate)
+
+        copies = [candidate for candidate, keys in matches.items()
+                  if 'origin' in keys or ('packs' in keys and self._origin_unknown(conn, candidate, identity))]
+        if not copies:
+            return None
+        # The original is the earliest indexed repository that is not a copy itself
+        entries = {candidate: self._entry(conn, candidate) or (0, None, None) for candidate in copies}
+        original = min(copies, key=lambda candidate: (bool(entries[candidate][1]), entries[candidate][0]))
+        # Moved across filesystems: copied, then deleted
+        match = 'copy' if os.path.exists(original) else 'move'
+        return {'match': match, 'original': original, 'matched_on': matches[original]}
+
+    @staticmethod
+    def _origin_unknown(conn: sqlite3.Connection, candidate: str, identity: dict) -> bool:
+        """Identical packs only point to a copy if a reflog is missing.
+
+        Two fresh clones of the same remote can download identical packs,
+        but their first reflog entries differ.
+        """
+        if not identity['origin']:
+            return True
+        return conn.execute("SELECT 1 FROM identities WHERE key = 'origin' AND path = ?",
+                            (candidate,)).fetchone() is None
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+copy_index = CopyIndex()
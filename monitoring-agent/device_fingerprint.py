@@ -1,13 +1,102 @@
+import os
+import json
 import platform
 import socket
 import hashlib
-import uuid
-import psutil
+
+from fingerprint_cache import fingerprint_cache
+
+
+class NativeFingerprintCollector:
+    """Collects machine identity straight from /sys, /etc and /proc.
+
+    No subprocess and no network access, so a fingerprint takes microseconds.
+    Only interfaces backed by a physical device are used, so virtual
+    interfaces (docker, veth, VPN tunnels) that come and go do not change the
+    fingerprint.
+    """
+
+    SYS_NET = '/sys/class/net'
+    MACHINE_ID_FILES = ('/etc/machine-id', '/var/lib/dbus/machine-id')
+    CPUINFO = '/proc/cpuinfo'
+    ROUTES = '/proc/net/route'
+    RTF_UP = 0x1
+
+    @classmethod
+    def available(cls):
+        return os.path.isdir(cls.SYS_NET)
+
+    @classmethod
+    def mac_addresses(cls):
+        macs = []
+        with os.scandir(cls.SYS_NET) as entries:
+            for entry in entries:
+                if not os.path.exists(os.path.join(entry.path, 'device')):
+                    continue
+                try:
+                    with open(os.path.join(entry.path, 'address'), 'r') as f:
+                        mac = f.read().strip()
+                except OSError:
+                    continue
+                if mac and mac != '00:00:00:00:00:00':
+                    macs.append(mac)
+        return sorted(macs)
+
+    @classmethod
+    def machine_id(cls):
+        for path in cls.MACHINE_ID_FILES:
+            try:
+                with open(path, 'r') as f:
+                    machine_id = f.read().strip()
+            except OSError:
+                continue
+            if machine_id:
+                return machine_id
+        return ''
+
+    @classmethod
+    def cpu_model(cls):
+        try:
+            with open(cls.CPUINFO, 'r') as f:
+                for line in f:
+                    key, _, value = line.partition(':')
+                    if key.strip() in ('model name', 'Hardware', 'cpu model'):
+                        return value.strip()
+        except OSError:
+            pass
+        return platform.machine()
+
+    @classmethod
+    def default_interface(cls):
+        """Interface carrying the default route with the lowest metric, or None"""
+        best = None
+        try:
+            with open(cls.ROUTES, 'r') as f:
+                next(f, None)
+                for line in f:
+                    fields = line.split()
+                    if len(fields) < 7 or fields[1] != '00000000' or not int(fields[3], 16) & cls.RTF_UP:
+                        continue
+                    metric = int(fields[6])
+                    if best is None or metric < best[0]:
+                        best = (metric, fields[0])
+        except (OSError, ValueError):
+            return None
+        return best[1] if best else None
+
+    @classmethod
+    def collect(cls):
+        return {
+            'macs': cls.mac_addresses(),
+            'machine_id': cls.machine_id(),
+            'cpu': f"{cls.cpu_model()} - {os.cpu_count()} cores"
+        }
 
 
 class DeviceFingerprint:
     @staticmethod
     def get_mac_address():
+        import uuid
         mac = ':'.join(['{:02x}'.format((uuid.getnode() >> elements) & 0xff)
                         for elements in range(0, 2*6, 2)][::-1])
         return mac
@@ -18,6 +107,7 @@ class DeviceFingerprint:
 
     @staticmethod
     def get_cpu_info():
+        import psutil
         return f"{platform.processor()} - {psutil.cpu_count()} cores"
 
     @staticmethod
@@ -27,16 +117,29 @@ class DeviceFingerprint:
     @staticmethod
     def get_ip_address():
         try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            ip = s.getsockname()[0]
-            s.close()
-            return ip
+            import psutil
+            stats = psutil.net_if_stats()
+            interfaces = psutil.net_if_addrs()
+            # Bridges such as docker0 or virbr0 are up too; prefer the
+            # interface that actually reaches the network
+            default = NativeFingerprintCollector.default_interface()
+            names = sorted(interfaces, key=lambda name: name != default)
+            for name in names:
+                if name in stats and not stats[name].isup:
+                    continue
+                for address in interfaces[name]:
+                    if address.family == socket.AF_INET and not address.address.startswith('127.'):
+                        return address.address
         except Exception:
-            return "127.0.0.1"
+            pass
+        return "127.0.0.1"
 
     @classmethod
     def generate_fingerprint(cls):
+        return fingerprint_cache.get('device', cls._compute_fingerprint)
+
+    @classmethod
+    def _compute_fingerprint(cls):
         mac = cls.get_mac_address()
         hostname = cls.get_hostname()
         cpu = cls.get_cpu_info()
@@ -47,6 +150,37 @@ class DeviceFingerprint:
 
         return fingerprint
 
+    @classmethod
+    def generate_host_fingerprint(cls):
+        """Fingerprint used by the repository protection agents, as (fingerprint, device_info)"""
+        cached = fingerprint_cache.get('host', cls._compute_host_fingerprint)
+        if not cached:
+            return None, None
+        return cached['fingerprint'], cached['device_info']
+
+    @staticmethod
+    def _compute_host_fingerprint():
+        if NativeFingerprintCollector.available():
+            native = NativeFingerprintCollector.collect()
+            mac_info = '\n'.join(native['macs'] + [native['machine_id'], native['cpu']])
+        else:
+            import subprocess
+            command = ['getmac'] if platform.system() == 'Windows' else ['ifconfig']
+            mac_info = subprocess.run(command, capture_output=True, text=True).stdout
+
+        device_info = {
+            'hostname': platform.node(),
+            'platform': platform.system(),
+            'arch': platform.machine(),
+            'mac_info': hashlib.sha256(mac_info.encode()).hexdigest()
+        }
+
+        fingerprint_string = json.dumps(device_info, sort_keys=True)
+        return {
+            'fingerprint': hashlib.sha256(fingerprint_string.encode()).hexdigest(),
+            'device_info': device_info
+        }
+
     @classmethod
     def get_device_info(cls):
         return {
@@ -57,3 +191,32 @@ class DeviceFingerprint:
             'osInfo': cls.get_os_info(),
             'ipAddress': cls.get_ip_address()
         }
+
+
+def benchmark(rounds=1000):
+    """Compare native collection with generate_fingerprint and the ifconfig path"""
+    import shutil
+    import subprocess
+    import timeit
+
+    def report(label, func, number):
+        seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+        print(f"{label:<40} {seconds * 1e6:>12.1f} us")
+
+    if NativeFingerprintCollector.available():
+        report('NativeFingerprintCollector.collect', NativeFingerprintCollector.collect, rounds)
+        report('host fingerprint (native, uncached)', DeviceFingerprint._compute_host_fingerprint, rounds)
+    else:
+        print("Native collector not available on this platform")
+
+    report('DeviceFingerprint.generate_fingerprint', DeviceFingerprint._compute_fingerprint, 20)
+
+    if shutil.which('ifconfig'):
+        report("subprocess.run(['ifconfig'])",
+               lambda: subprocess.run(['ifconfig'], capture_output=True, text=True), 20)
+    else:
+        print("ifconfig not installed, skipping subprocess benchmark")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,143 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+
+QUIET_WINDOW = 2.0
+MAX_DELAY = 30.0
+WORKERS = 2
+REPO_CACHE_SIZE = 64
+
+
+class RepoHandleCache:
+    """Least recently used cache of git.Repo objects.
+
+    Building a Repo re-reads the repository config every time, and GitPython
+    keeps helper processes per Repo, so handles are reused and closed when
+    they are evicted.
+    """
+
+    def __init__(self, max_size: int = REPO_CACHE_SIZE):
+        self.max_size = max_size
+        self._repos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, repo_path: str):
+        import git
+
+        with self._lock:
+            repo = self._repos.get(repo_path)
+            if repo is not None:
+                self._repos.move_to_end(repo_path)
+                return repo
+
+        repo = git.Repo(repo_path)
+        with self._lock:
+            self._repos[repo_path] = repo
+            while len(self._repos) > self.max_size:
+                _, evicted = self._repos.popitem(last=False)
+                evicted.close()
+        return repo
+
+    def discard(self, repo_path: str):
+        with self._lock:
+            repo = self._repos.pop(repo_path, None)
+        if repo is not None:
+            repo.close()
+
+    def clear(self):
+        with self._lock:
+            repos = list(self._repos.values())
+            self._repos.clear()
+        for repo in repos:
+            repo.close()
+
+
+class DirtyCheckScheduler:
+    """Debounces and coalesces dirty checks per repository.
+
+    A burst of file events in one repository (an ``npm install``, a build)
+    results in a single check once the repository has been quiet for
+    ``quiet_window`` seconds. Continuous activity is still checked every
+    ``max_delay`` seconds. Each repository has at most one check running
+    and one pending. At most ``workers`` checks run at the same time; other
+    due checks wait their turn instead of queueing up.
+    """
+
+    def __init__(self, check: Callable[[str], None], quiet_window: float = QUIET_WINDOW,
+                 max_delay: float = MAX_DELAY, workers: int = WORKERS):
+        self.check = check
+        self.quiet_window = quiet_window
+        self.max_delay = max(max_delay, quiet_window)
+        self.workers = max(1, workers)
+        self.logger = logging.getLogger(__name__)
+        self.stats = {'events': 0, 'coalesced': 0, 'checks': 0, 'failed': 0}
+        self._due = {}
+        self._running = set()
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dirty-check')
+        self._thread = threading.Thread(target=self._run, name='dirty-check-scheduler', daemon=True)
+        self._thread.start()
+
+    def schedule(self, repo_path: str):
+        now = time.monotonic()
+        with self._cond:
+            self.stats['events'] += 1
+            pending = self._due.get(repo_path)
+            if pending:
+                # Pushing the deadline back never needs to wake the scheduler
+                self._due[repo_path] = (pending[0], now)
+                self.stats['coalesced'] += 1
+            else:
+                self._due[repo_path] = (now, now)
+                self._cond.notify()
+
+    def cancel(self, repo_path: str):
+        """Drop a pending check, e.g. for a repository that is no longer monitored"""
+        with self._cond:
+            self._due.pop(repo_path, None)
+
+    def _deadline(self, first_event: float, last_event: float) -> float:
+        return min(last_event + self.quiet_window, first_event + self.max_delay)
+
+    def _run(self):
+        with self._cond:
+            while not self._stopped:
+                now = time.monotonic()
+                timeout = None
+                for repo_path, (first_event, last_event) in list(self._due.items()):
+                    if repo_path in self._running:
+                        continue
+                    deadline = self._deadline(first_event, last_event)
+                    if deadline <= now and len(self._running) < self.workers:
+                        del self._due[repo_path]
+                        self._running.add(repo_path)
+                        self._pool.submit(self._check, repo_path)
+                    elif deadline > now:
+                        timeout = deadline - now if timeout is None else min(timeout, deadline - now)
+                self._cond.wait(timeout)
+
+    def _check(self, repo_path: str):
+        try:
+            self.check(repo_path)
+        except Exception as e:
+            self.logger.error(f"Dirty check failed for {repo_path}: {str(e)}")
+            with self._cond:
+                self.stats['failed'] += 1
+        finally:
+            with self._cond:
+                self._running.discard(repo_path)
+                self.stats['checks'] += 1
+                self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._stopped = True
+            self._due.clear()
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+import logging
+from typing import Callable, Dict, Optional
+
+from dirty_check import DirtyCheckScheduler
+
+
+QUIET_WINDOW = 2.0
+MAX_WINDOW = 30.0
+MAX_TRACKED_PATHS = 100000
+
+# Operations that write one reflog entry per step; anything else, such as two
+# commits in quick succession, stays one activity per entry
+MULTI_STEP_ACTIONS = frozenset({'rebase', 'cherry-pick', 'clone'})
+
+
+class _Burst:
+    __slots__ = ('started', 'events', 'paths', 'bytes', 'activities')
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.events = 0
+        self.paths = set()
+        self.bytes = 0
+        self.activities = []
+
+
+class EventCoalescer:
+    """Groups a repository's events into one activity per logical git operation.
+
+    A clone, checkout or pull touches thousands of files and can write
+    several reflog lines. Everything that happens in a repository is
+    collected until it has been quiet for ``quiet_window`` seconds (or for
+    at most ``max_window`` seconds), then emitted at once:
+
+    - consecutive steps of one multi-step operation (the ``pick`` steps of a
+      rebase or cherry-pick, the clone seen both as a new directory and in
+      the reflog) are merged into one, keeping the first old SHA, the last
+      new SHA and every step's SHA in ``commits``, and counting the reflog
+      entries. Other activities, such as separate commits, are never merged.
+    - the last activity gets the burst's aggregates: events, files touched
+      and bytes of created and modified files, if there were file events
+    - a GIT_CLONE is only emitted once the repository's ``.git`` exists,
+      and only once per burst
+    - file events without a git operation are only counted, never emitted
+
+    ``signal`` emits a high-priority activity (a repository move)
+    immediately, flushing what was collected before it.
+    """
+
+    def __init__(self, emit: Callable[[str, dict], None], quiet_window: float = QUIET_WINDOW,
+                 max_window: float = MAX_WINDOW):
+        self.emit = emit
+        self.logger = logging.getLogger(__name__)
+        self.stats = {'events': 0, 'activities': 0, 'emitted': 0}
+        self._bursts: Dict[str, _Burst] = {}
+        self._lock = threading.Lock()
+        self._scheduler = DirtyCheckScheduler(self.flush, quiet_window=quiet_window,
+                                              max_delay=max_window, workers=1)
+
+    def record(self, repo_path: str, event_type: str, path: str, is_directory: bool = False):
+        """Count a filesystem event towards the repository's current burst"""
+        size = 0
+        if not is_directory and event_type in ('created', 'modified'):
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                pass
+        with self._lock:
+            burst = self._burst(repo_path)
+            burst.events += 1
+            burst.bytes += size
+            if len(burst.paths) < MAX_TRACKED_PATHS:
+                burst.paths.add(path)
+            self.stats['events'] += 1
+        self._scheduler.schedule(repo_path)
+
+    def add_activity(self, repo_path: str, activity: dict):
+        """Queue an activity; it is emitted with its burst"""
+        with self._lock:
+            self._burst(repo_path).activities.append(activity)
+            self.stats['activities'] += 1
+        self._scheduler.schedule(repo_path)
+
+    def signal(self, repo_path: str, activity: dict):
+        """Flush the repository's burst and emit ``activity`` right away"""
+        self.flush(repo_path)
+        self._emit(repo_path, activity)
+
+    def flush(self, repo_path: Optional[str] = None):
+        if repo_path is None:
+            with self._lock:
+                repo_paths = list(self._bursts)
+            for path in repo_paths:
+                self.flush(path)
+            return
+
+        with self._lock:
+            burst = self._bursts.pop(repo_path, None)
+        if burst is None or not burst.activities:
+            return
+
+        activities = self._merge(burst.activities)
+        if not os.path.exists(os.path.join(repo_path, '.git')):
+            # An aborted clone, or a repository deleted again
+            activities = [activity for activity in activities if activity['activityType'] != 'GIT_CLONE']
+        if not activities:
+            return
+
+        if burst.events:
+            details = activities[-1].setdefault('details', {})
+            details['events'] = burst.events
+            details['filesTouched'] = len(burst.paths)
+            details['bytes'] = burst.bytes
+            details['durationMs'] = int((time.monotonic() - burst.started) * 1000)
+        for activity in activities:
+            self._emit(repo_path, activity)
+
+    def _burst(self, repo_path: str) -> _Burst:
+        burst = self._bursts.get(repo_path)
+        if burst is None:
+            burst = self._bursts[repo_path] = _Burst()
+        return burst
+
+    @staticmethod
+    def _action(activity: dict):
+        return activity['activityType'], activity.get('details', {}).get('action')
+
+    @staticmethod
+    def _from_reflog(activity: dict) -> bool:
+        return activity.get('details', {}).get('source') == 'reflog'
+
+    def _merge(self, activities):
+        merged = []
+        reflog_entries = []
+        commits = []
+        for activity in activities:
+            previous = merged[-1] if merged else None
+            new_sha = activity.get('details', {}).get('newSha')
+            if (previous is None or self._action(previous) != self._action(activity)
+                    or self._action(activity)[1] not in MULTI_STEP_ACTIONS):
+                merged.append(activity)
+                reflog_entries.append(int(self._from_reflog(activity)))
+                commits.append([new_sha] if new_sha else [])
+                continue
+            details = previous.setdefault('details', {})
+            old_sha = details.get('oldSha')
+            for key, value in activity.items():
+                if key != 'details' and value is not None:
+                    previous[key] = value
+            details.update({key: value for key, value in activity.get('details', {}).items() if value is not None})
+            if old_sha:
+                details['oldSha'] = old_sha
+            reflog_entries[-1] += int(self._from_reflog(activity))
+            if new_sha:
+                commits[-1].append(new_sha)
+
+        for activity, count, shas in zip(merged, reflog_entries, commits):
+            if count > 1:
+                # e.g. the picks of a rebase
+                activity['details']['count'] = count
+            if len(shas) > 1:
+                activity['details']['commits'] = shas
+        return merged
+
+    def _emit(self, repo_path: str, activity: dict):
+        with self._lock:
+            self.stats['emitted'] += 1
+        try:
+            self.emit(repo_path, activity)
+        except Exception as e:
+            self.logger.error(f"Failed to emit activity: {str(e)}")
+
+    def close(self):
+        self._scheduler.close()
+        self.flush()
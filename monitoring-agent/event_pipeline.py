@@ -0,0 +1,225 @@
+import json
+import os
+import queue
+import threading
+import time
+import logging
+from collections import namedtuple
+from pathlib import Path
+from typing import Callable, Optional
+
+
+POLICY_BLOCK = 'block'
+POLICY_DROP = 'drop'
+POLICY_SPILL = 'spill'
+POLICIES = (POLICY_BLOCK, POLICY_DROP, POLICY_SPILL)
+
+DEFAULT_SPILL_DIR = Path.home() / '.devmonitor'
+MAX_SPILL_BYTES = 64 * 1024 * 1024
+IDLE_POLL = 0.5
+WARNING_INTERVAL = 30
+
+_STOP = object()
+
+# A filesystem event reduced to plain values, so it can be spilled to disk
+FileEvent = namedtuple('FileEvent', ['event_type', 'src_path', 'dest_path', 'is_directory'])
+
+
+def file_event(event) -> FileEvent:
+    return FileEvent(event.event_type, event.src_path, getattr(event, 'dest_path', None), event.is_directory)
+
+
+class EventPipeline:
+    """Bounded queue between the watchdog observer thread and a worker pool.
+
+    The observer thread only filters events and calls ``submit``; the
+    workers run ``handler``. When the queue is full the policy decides:
+
+    - ``block`` waits up to ``block_timeout`` seconds, slowing the observer
+      down instead of letting memory grow, then drops the event
+    - ``drop`` drops the new event immediately
+    - ``spill`` appends it to a JSON lines file that idle workers process
+      once the queue has drained. Until the file is drained, later items
+      are spilled too so they are handled in order. Items must be JSON
+      serializable; at most MAX_SPILL_BYTES are spilled before events are
+      dropped. The drain position is recorded per line, so after a crash
+      only unprocessed items are replayed.
+
+    ``counters()`` reports queue depth and how many events were processed,
+    dropped or spilled.
+    """
+
+    def __init__(self, handler: Callable[[object], None], name: str = 'events', max_size: int = 1000,
+                 workers: int = 2, policy: str = POLICY_BLOCK, block_timeout: float = 1.0,
+                 spill_file: Optional[Path] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy!r}, expected one of {', '.join(POLICIES)}")
+        self.handler = handler
+        self.name = name
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.spill_file = Path(spill_file) if spill_file else DEFAULT_SPILL_DIR / f'{name}-spill.jsonl'
+        self.logger = logging.getLogger(__name__)
+        self.queue = queue.Queue(max(1, max_size))
+        self.stats = {'submitted': 0, 'processed': 0, 'failed': 0, 'dropped': 0, 'spilled': 0, 'max_depth': 0}
+        self._stats_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._spill_bytes = 0
+        # Items left over from a previous run come before anything new
+        self._spilling = policy == POLICY_SPILL and (
+            self.spill_file.exists() or self._draining_file().exists())
+        self._last_warning = 0.0
+        self._stopped = False
+        self._threads = [threading.Thread(target=self._work, name=f'{name}-worker', daemon=True)
+                         for _ in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, item) -> bool:
+        """Queue an item; returns False if it was dropped"""
+        self._count('submitted')
+        if self._spilling:
+            # Queued while earlier items wait on disk, it would overtake them
+            if self._spill(item, only_while_spilling=True):
+                return True
+            if self._spilling:
+                self._count('dropped')
+                self._warn_overload()
+                return False
+        try:
+            if self.policy == POLICY_BLOCK:
+                self.queue.put(item, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(item)
+        except queue.Full:
+            if self.policy == POLICY_SPILL and self._spill(item):
+                return True
+            self._count('dropped')
+            self._warn_overload()
+            return False
+
+        depth = self.queue.qsize()
+        if depth > self.stats['max_depth']:
+            with self._stats_lock:
+                self.stats['max_depth'] = max(self.stats['max_depth'], depth)
+        return True
+
+    def counters(self) -> dict:
+        with self._stats_lock:
+            counters = dict(self.stats)
+        counters['depth'] = self.queue.qsize()
+        return counters
+
+    def _work(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=IDLE_POLL)
+            except queue.Empty:
+                if self._stopped:
+                    return
+                self._drain_spill()
+                continue
+            if item is _STOP:
+                return
+            self._handle(item)
+
+    def _handle(self, item):
+        try:
+            self.handler(item)
+            self._count('processed')
+        except Exception as e:
+            self._count('failed')
+            self.logger.error(f"{self.name}: failed to handle event: {str(e)}")
+
+    def _spill(self, item, only_while_spilling: bool = False) -> bool:
+        try:
+            line = json.dumps(item) + '\n'
+        except (TypeError, ValueError):
+            return False
+        with self._spill_lock:
+            if only_while_spilling and not self._spilling:
+                return False
+            if self._spill_bytes + len(line) > MAX_SPILL_BYTES:
+                return False
+            try:
+                self.spill_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.spill_file, 'a') as f:
+                    f.write(line)
+            except OSError:
+                return False
+            self._spill_bytes += len(line)
+            self._spilling = True
+        self._count('spilled')
+        return True
+
+    def _draining_file(self) -> Path:
+        return self.spill_file.with_suffix('.draining')
+
+    def _drain_spill(self):
+        """Process spilled items, also ones left over from a previous run"""
+        if not self._drain_lock.acquire(blocking=False):
+            return
+        try:
+            draining = self._draining_file()
+            while True:
+                if not draining.exists():
+                    with self._spill_lock:
+                        try:
+                            os.replace(self.spill_file, draining)
+                        except FileNotFoundError:
+                            # Everything spilled has been handled; queue again
+                            self._spilling = False
+                            return
+                        self._spill_bytes = 0
+                self._drain_file(draining)
+        except OSError as e:
+            self.logger.debug(f"{self.name}: could not drain spill file: {e}")
+        finally:
+            self._drain_lock.release()
+
+    def _drain_file(self, draining: Path):
+        # The offset of the first unprocessed line is kept next to the file,
+        # so a restart resumes there instead of replaying handled items
+        offset_file = draining.with_suffix('.offset')
+        try:
+            offset = int(offset_file.read_text() or 0)
+        except (OSError, ValueError):
+            offset = 0
+        progress_fd = os.open(offset_file, os.O_RDWR | os.O_CREAT, 0o600)
+        with open(draining, 'rb') as f, os.fdopen(progress_fd, 'w') as progress:
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    pass
+                else:
+                    self._handle(item)
+                progress.seek(0)
+                progress.write(f'{offset:<20}')
+                progress.flush()
+        os.unlink(draining)
+        os.unlink(offset_file)
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _warn_overload(self):
+        now = time.monotonic()
+        if now - self._last_warning >= WARNING_INTERVAL:
+            self._last_warning = now
+            self.logger.warning(f"{self.name}: queue full, dropping events ({self.counters()})")
+
+    def close(self, timeout: float = 5.0):
+        """Process what is queued, then stop the workers"""
+        self._stopped = True
+        for _ in self._threads:
+            try:
+                self.queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                break
+        for thread in self._threads:
+            thread.join(timeout=timeout)
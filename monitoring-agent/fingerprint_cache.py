@@ -0,0 +1,94 @@
+import json
+import os
+import platform
+import socket
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Callable, Optional
+
+
+DEFAULT_CACHE_FILE = Path.home() / '.devmonitor' / 'fingerprint.json'
+MAX_AGE = 24 * 60 * 60
+
+
+def environment_key() -> str:
+    """Cheap summary of what a fingerprint depends on, computed without subprocesses.
+
+    Covers the hostname, the platform and the set of network interfaces. If
+    any of these change, cached fingerprints are recomputed.
+    """
+    try:
+        interfaces = sorted(name for _, name in socket.if_nameindex())
+    except (AttributeError, OSError):
+        interfaces = []
+    return json.dumps([platform.node(), platform.system(), platform.machine(), interfaces])
+
+
+class FingerprintCache:
+    """Fingerprints cached on disk and shared by every agent process.
+
+    Each git hook starts a new interpreter, so an in-memory cache alone
+    would not help. Entries are stored per fingerprint scheme together with
+    the environment key they were computed under.
+    """
+
+    def __init__(self, cache_file: Optional[Path] = None, max_age: float = MAX_AGE):
+        self.cache_file = Path(cache_file) if cache_file else DEFAULT_CACHE_FILE
+        self.max_age = max_age
+        self.logger = logging.getLogger(__name__)
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def get(self, scheme: str, compute: Callable):
+        with self._lock:
+            # Long-running agents outlive interface and hostname changes, so
+            # the in-memory copy is checked against the environment as well
+            key = environment_key()
+            entry = self._memory.get(scheme)
+            if self._fresh(entry, key):
+                return entry['value']
+
+            entries = self._read()
+            entry = entries.get(scheme)
+            if not self._fresh(entry, key):
+                entry = {'key': key, 'value': compute(), 'created_at': time.time()}
+                if entry['value'] is not None:
+                    entries[scheme] = entry
+                    self._write(entries)
+
+            self._memory[scheme] = entry
+            return entry['value']
+
+    def _fresh(self, entry: Optional[dict], key: str) -> bool:
+        return bool(entry) and entry.get('key') == key and time.time() - entry.get('created_at', 0) < self.max_age
+
+    def invalidate(self):
+        with self._lock:
+            self._memory.clear()
+            try:
+                self.cache_file.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _read(self) -> dict:
+        try:
+            with open(self.cache_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, entries: dict):
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix(f'.{os.getpid()}.tmp')
+            with open(tmp_file, 'w') as f:
+                json.dump(entries, f)
+            os.chmod(tmp_file, 0o600)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            self.logger.debug(f"Could not persist fingerprint cache: {e}")
+
+
+fingerprint_cache = FingerprintCache()
@@ -1,132 +1,440 @@
 import os
 import subprocess
+import threading
 import time
 import logging
 from datetime import datetime
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-import git
+
+from copy_index import copy_index
+from dirty_check import DirtyCheckScheduler, RepoHandleCache
+from event_coalescer import EventCoalescer
+from event_pipeline import EventPipeline, FileEvent, file_event
+from git_refs import ref_resolver, resolve_git_dirs
+from path_index import PathIndex
+from reflog_tailer import ReflogTailer
+from repo_discovery import RepositoryDiscovery
+
+
+WATCH_RECURSIVE = 'recursive'
+WATCH_METADATA = 'metadata'
+WATCH_MODES = (WATCH_RECURSIVE, WATCH_METADATA)
+
+# Directories inside a git dir that are watched recursively in metadata mode
+METADATA_DIRS = ('refs', 'logs')
 
 
 class GitRepositoryMonitor(FileSystemEventHandler):
-    def __init__(self, api_client):
+    def __init__(self, api_client, discovery=None, dirty_check_options=None, watch_mode=WATCH_RECURSIVE,
+                 reflogs=None, pipeline_options=None, coalescer_options=None):
+        if watch_mode not in WATCH_MODES:
+            raise ValueError(f"Unknown watch mode {watch_mode!r}, expected one of {', '.join(WATCH_MODES)}")
         self.api_client = api_client
+        self.discovery = discovery or RepositoryDiscovery()
+        self.watch_mode = watch_mode
+        self.reflogs = reflogs or ReflogTailer()
         self.logger = logging.getLogger(__name__)
-        self.monitored_repos = {}
-
-    def detect_git_repositories(self, path):
-        git_repos = []
-        for root, dirs, files in os.walk(path):
-            if '.git' in dirs:
-                git_repos.append(root)
-                dirs.remove('.git')
+        self.monitored_repos = PathIndex()
+        self.git_dirs = PathIndex()
+        self.repo_handles = RepoHandleCache()
+        self.dirty_checks = DirtyCheckScheduler(self.check_uncommitted_changes, **(dirty_check_options or {}))
+        self.pipeline = EventPipeline(self.handle_event, name='git-events', **(pipeline_options or {}))
+        self.coalescer = EventCoalescer(self.log_activity, **(coalescer_options or {}))
+        self.observer = None
+        self.roots = []
+        self.watches = {}
+        # Repositories that appeared while monitoring, with when they appeared
+        self.new_repositories = {}
+        self._watch_lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.startup_metrics = {}
+
+    def detect_git_repositories(self, *paths):
+        """Find repositories, adding each one to the monitor as soon as it is found"""
+        on_directory = self.watch_directory if self.watch_mode == WATCH_METADATA else None
+        git_repos = self.discovery.discover(paths, on_repository=self.add_repository, on_directory=on_directory)
+        stats = self.discovery.stats
+        self.record_startup_metric('discovery_complete')
+        self.logger.info(f"Found {len(git_repos)} repositories in {stats['seconds']:.2f}s "
+                         f"({stats['scanned']} directories scanned, {stats['cached']} unchanged)")
+        if self.watch_mode == WATCH_METADATA:
+            self.logger.info(f"Watching {len(self.watches)} paths in metadata mode")
         return git_repos
 
-    def monitor_git_operations(self):
-        original_methods = {}
+    def add_repository(self, repo_path, new=False):
+        """Start monitoring a repository; ``new`` ones have their whole reflog reported"""
+        added = self.monitored_repos.add(repo_path)
+        if not added:
+            return False
+        if len(self.monitored_repos) == 1:
+            self.record_startup_metric('first_repository')
 
-        def wrap_git_command(command_name, original_method):
-            def wrapper(*args, **kwargs):
-                repo_path = args[0].working_dir if hasattr(args[0], 'working_dir') else os.getcwd()
+        try:
+            git_dirs = set(resolve_git_dirs(repo_path))
+        except OSError as e:
+            self.logger.debug(f"Cannot resolve git dir of {repo_path}: {str(e)}")
+            return True
+        for git_dir in git_dirs:
+            self.git_dirs.add(git_dir, repo_path)
+            # Operations made while the agent was stopped
+            for activity in self.reflogs.register(git_dir, repo_path, from_start=new,
+                                                  not_before=self.new_repositories.get(repo_path)):
+                self.coalescer.add_activity(repo_path, activity)
 
-                self.log_activity({
-                    'activityType': f'GIT_{command_name.upper()}',
-                    'repository': os.path.basename(repo_path),
-                    'details': {
-                        'command': command_name,
-                        'path': repo_path,
-                        'timestamp': datetime.now().isoformat()
-                    }
-                })
+        if self.watch_mode == WATCH_METADATA:
+            self.watch_git_metadata(repo_path, git_dirs)
+        if not new:
+            # New repositories are still being written; they are checked with their GIT_CLONE
+            self.check_repository_copy(repo_path)
+        return True
 
-                return original_method(*args, **kwargs)
+    def remove_repository(self, repo_path):
+        if not self.monitored_repos.remove(repo_path):
+            return False
+        self.new_repositories.pop(repo_path, None)
+        self.dirty_checks.cancel(repo_path)
+        self.repo_handles.discard(repo_path)
+        try:
+            git_dirs = set(resolve_git_dirs(repo_path))
+        except OSError:
+            # Already gone; a normal clone's git dir was inside it
+            git_dirs = {os.path.join(repo_path, '.git')}
+        for git_dir in git_dirs:
+            if self.git_dirs.lookup(git_dir) == repo_path:
+                self.git_dirs.remove(git_dir)
+            self.unwatch(git_dir)
+            for name in METADATA_DIRS:
+                self.unwatch(os.path.join(git_dir, name))
+        return True
 
-            return wrapper
+    def watch(self, path, recursive=False):
+        """Schedule a watch once per path; returns False if it is already watched or missing"""
+        with self._watch_lock:
+            if path in self.watches or self.observer is None or not os.path.isdir(path):
+                return False
+            try:
+                self.watches[path] = self.observer.schedule(self, path, recursive=recursive)
+            except OSError as e:
+                # Typically the inotify watch limit
+                self.logger.warning(f"Cannot watch {path}: {str(e)}")
+                return False
+        return True
 
-        return original_methods
+    def unwatch(self, path):
+        with self._watch_lock:
+            watch = self.watches.pop(path, None)
+            if watch is not None and self.observer is not None:
+                try:
+                    self.observer.unschedule(watch)
+                except (KeyError, OSError):
+                    pass
 
-    def check_repository_copy(self, src_path, dst_path):
-        if os.path.exists(os.path.join(src_path, '.git')):
-            self.logger.warning(f"Repository copy detected: {src_path} -> {dst_path}")
+    def watch_directory(self, path):
+        """Watch a directory outside any repository for new clones, without its subtree"""
+        self.watch(path)
 
-            self.log_activity({
-                'activityType': 'REPO_COPY',
-                'repository': os.path.basename(src_path),
-                'details': {
-                    'source': src_path,
-                    'destination': dst_path,
-                    'timestamp': datetime.now().isoformat()
-                }
-            })
+    def watch_git_metadata(self, repo_path, git_dirs):
+        """Watch HEAD, packed-refs, refs/ and logs/ instead of the working tree"""
+        # The repository root itself no longer needs a directory watch
+        self.unwatch(repo_path)
+        for directory in git_dirs:
+            self.watch(directory)
+            for name in METADATA_DIRS:
+                self.watch(os.path.join(directory, name), recursive=True)
 
-            return True
+    def is_clone_candidate(self, path):
+        """A new directory in metadata mode that may become a repository"""
+        name = os.path.basename(path)
+        if name.startswith('.') or name in self.discovery.prune:
+            return False
+        if self.monitored_repos.lookup(path) or self.git_dirs.lookup(path):
+            return False
+        for root in self.roots:
+            relative = os.path.relpath(path, root)
+            if not relative.startswith(os.pardir):
+                return relative.count(os.sep) < self.discovery.max_depth
         return False
 
-    def watch_git_commands(self):
-        self.logger.info("Starting git command monitoring...")
+    def record_startup_metric(self, name):
+        """Seconds from agent start until ``name`` happened, recorded once"""
+        if name not in self.startup_metrics:
+            self.startup_metrics[name] = time.monotonic() - self.started_at
+            self.logger.info(f"Startup: {name.replace('_', ' ')} after {self.startup_metrics[name]:.3f}s")
+
+    def dispatch(self, event):
+        """Runs in the observer thread, so only cheap work happens here"""
+        if 'first_event' not in self.startup_metrics:
+            self.record_startup_metric('first_event')
+        if event.event_type not in ('created', 'modified', 'moved', 'deleted'):
+            # opened/closed events carry nothing the monitor uses
+            return
+        if event.event_type == 'created':
+            repo_path = self.new_repository(event)
+            if repo_path:
+                # Registered right away, so the clone's files that follow are routed to it
+                self.register_clone(repo_path)
+                return
+        if not event.is_directory:
+            if event.event_type == 'deleted':
+                return
+            path = event.dest_path if event.event_type == 'moved' else event.src_path
+            if not self.is_reflog(path):
+                # The bulk of all events; a trie lookup, a stat and a dict update
+                self.on_file_changed(event.event_type, path)
+                return
+        elif event.event_type == 'modified':
+            return
+        self.pipeline.submit(file_event(event))
+
+    def handle_event(self, item):
+        """Runs in a pipeline worker: registration, reflog reads and activity logging"""
+        super().dispatch(FileEvent(*item))
+
+    def check_repository_copy(self, repo_path):
+        """Index a repository by content identity and report it if it copies a known one.
+
+        Moves only update the index; live moves are reported by
+        on_directory_moved.
+        """
+        match = copy_index.add(repo_path)
+        if not match or match['match'] != 'copy':
+            return False
+
+        src_path = match['original']
+        self.logger.warning(f"Repository copy detected: {src_path} -> {repo_path}")
 
-        git_commands = ['clone', 'pull', 'push', 'commit', 'checkout']
+        self.coalescer.signal(repo_path, {
+            'activityType': 'REPO_COPY',
+            'repository': os.path.basename(src_path),
+            'details': {
+                'source': src_path,
+                'destination': repo_path,
+                'matchedOn': match['matched_on'],
+                'path': repo_path,
+                'timestamp': datetime.now().isoformat()
+            }
+        })
+        return True
 
-        for cmd in git_commands:
-            self.monitor_command(cmd)
+    def is_reflog(self, path):
+        return os.sep + 'logs' + os.sep in path
 
-    def monitor_command(self, command):
-        pass
+    def find_git_dir(self, path):
+        directory = os.path.dirname(path)
+        while directory not in self.git_dirs:
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return None
+            directory = parent
+        return directory
 
-    def log_activity(self, activity_data):
+    def on_reflog_changed(self, log_path):
+        """Report git operations from the lines appended to a reflog"""
+        git_dir = self.find_git_dir(log_path)
+        if git_dir is None:
+            return
+        repo_path = self.git_dirs.lookup(log_path)
+        not_before = self.new_repositories.get(repo_path)
+        for activity in self.reflogs.read(log_path, git_dir, repo_path, not_before):
+            self.coalescer.add_activity(repo_path, activity)
+
+    def log_activity(self, repo_path, activity_data):
+        """Queue an activity, filling in the repository's current branch and commit"""
+        if 'branch' not in activity_data or 'commitHash' not in activity_data:
+            branch, commit = ref_resolver.resolve(repo_path)
+            # None on a detached HEAD or an unborn branch; the backend rejects null
+            if branch:
+                activity_data.setdefault('branch', branch)
+            if commit:
+                activity_data.setdefault('commitHash', commit)
+        if activity_data['activityType'] == 'GIT_CLONE':
+            if self.check_repository_copy(repo_path):
+                # A copied .git rather than a clone, already reported as REPO_COPY
+                return
+        elif activity_data['activityType'].startswith('GIT_'):
+            # Fetches and gc change the packs the copy index knows
+            copy_index.add(repo_path)
+        activity_data = {key: value for key, value in activity_data.items() if value is not None}
         try:
-            self.api_client.log_activity(activity_data)
+            self.api_client.enqueue_activity(activity_data)
         except Exception as e:
             self.logger.error(f"Failed to log activity: {str(e)}")
 
-    def on_created(self, event):
+    def new_repository(self, event):
+        """The repository a created path turns into one, if any"""
+        if os.path.basename(event.src_path) == '.git':
+            # git clone creates the directory first and .git inside it
+            return os.path.dirname(event.src_path)
         if event.is_directory and os.path.exists(os.path.join(event.src_path, '.git')):
-            self.logger.info(f"New git repository detected: {event.src_path}")
+            return event.src_path
+        return None
+
+    def register_clone(self, repo_path):
+        """Report a new repository once, when its burst of clone events is over"""
+        if repo_path in self.monitored_repos:
+            return False
+        # Reflog entries written before it appeared are copied history; the
+        # slack covers the reflog's whole-second timestamps
+        self.new_repositories[repo_path] = time.time() - 2
+        if not self.add_repository(repo_path, new=True):
+            return False
+        self.logger.info(f"New git repository detected: {repo_path}")
+
+        self.coalescer.add_activity(repo_path, {
+            'activityType': 'GIT_CLONE',
+            'repository': os.path.basename(repo_path),
+            'details': {
+                'action': 'clone',
+                'path': repo_path,
+                'timestamp': datetime.now().isoformat()
+            }
+        })
+        return True
+
+    def on_created(self, event):
+        path = event.src_path
+        if not event.is_directory and self.is_reflog(path):
+            self.on_reflog_changed(path)
+        if self.watch_mode == WATCH_METADATA:
+            self.on_metadata_created(event)
+        elif not event.is_directory:
+            self.on_file_changed(event.event_type, path)
+
+    def on_metadata_created(self, event):
+        path = event.src_path
+        parent = os.path.dirname(path)
+        if self.git_dirs.lookup(path):
+            if event.is_directory and os.path.basename(path) in METADATA_DIRS and parent in self.git_dirs:
+                # A fresh clone fills in its git dir after it was registered,
+                # and logs/ only appears with the first commit
+                self.watch(path, recursive=True)
+            self.on_metadata_changed(path)
+        elif event.is_directory and self.is_clone_candidate(path):
+            self.watch_directory(path)
+
+    def on_metadata_changed(self, path):
+        repo_path = self.git_dirs.lookup(path)
+        if repo_path:
+            self.dirty_checks.schedule(repo_path)
+
+    def on_modified(self, event):
+        if event.is_directory:
+            return
+        if self.is_reflog(event.src_path):
+            self.on_reflog_changed(event.src_path)
+        self.on_file_changed(event.event_type, event.src_path)
 
-            self.log_activity({
-                'activityType': 'GIT_CLONE',
-                'repository': os.path.basename(event.src_path),
+    def on_file_changed(self, event_type, path):
+        if self.watch_mode == WATCH_METADATA:
+            self.on_metadata_changed(path)
+            return
+        repo_path = self.monitored_repos.lookup(path)
+        if repo_path:
+            self.coalescer.record(repo_path, event_type, path)
+            self.dirty_checks.schedule(repo_path)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            self.on_directory_moved(event.src_path, event.dest_path)
+            return
+        if self.is_reflog(event.dest_path):
+            self.on_reflog_changed(event.dest_path)
+        # Refs and HEAD are written to a .lock file and renamed into place
+        self.on_file_changed(event.event_type, event.dest_path)
+
+    def repositories_under(self, path):
+        return list(self.monitored_repos.under(path))
+
+    def on_directory_moved(self, src_path, dest_path):
+        """A repository, or a directory holding repositories, was moved or renamed"""
+        if self.watch_mode == WATCH_METADATA:
+            self.unwatch(src_path)
+        for repo_path in self.repositories_under(src_path):
+            new_path = dest_path + repo_path[len(src_path):]
+            # What happened before the move is reported before it
+            self.coalescer.flush(repo_path)
+            self.remove_repository(repo_path)
+            self.add_repository(new_path)
+            self.logger.warning(f"Repository moved: {repo_path} -> {new_path}")
+
+            # Reported at once, ahead of anything still being coalesced
+            self.coalescer.signal(new_path, {
+                'activityType': 'REPO_ACCESS',
+                'repository': os.path.basename(new_path),
                 'details': {
-                    'path': event.src_path,
+                    'action': 'move',
+                    'source': repo_path,
+                    'destination': new_path,
+                    'path': new_path,
                     'timestamp': datetime.now().isoformat()
                 }
             })
 
-    def on_modified(self, event):
+    def on_deleted(self, event):
         if not event.is_directory:
-            file_path = event.src_path
-
-            for repo_path in self.monitored_repos:
-                if file_path.startswith(repo_path):
-                    self.check_uncommitted_changes(repo_path)
+            return
+        if self.watch_mode == WATCH_METADATA:
+            self.unwatch(event.src_path)
+        for repo_path in self.repositories_under(event.src_path):
+            # A later clone to the same path is reported again
+            self.remove_repository(repo_path)
+            copy_index.remove(repo_path)
 
     def check_uncommitted_changes(self, repo_path):
+        # A check already running when the repository was removed
+        if repo_path not in self.monitored_repos:
+            return
         try:
-            repo = git.Repo(repo_path)
+            repo = self.repo_handles.get(repo_path)
             if repo.is_dirty(untracked_files=True):
                 self.logger.debug(f"Uncommitted changes in: {repo_path}")
         except Exception as e:
+            # The repository may have been moved or deleted
+            self.repo_handles.discard(repo_path)
             self.logger.error(f"Error checking repository: {str(e)}")
 
-    def start_monitoring(self, paths):
+    def start_monitoring(self, paths, started_at=None):
+        if started_at is not None:
+            self.started_at = started_at
+
         observer = Observer()
+        self.observer = observer
+        paths = [path for path in paths if os.path.exists(path)]
+        self.roots = [os.path.realpath(path) for path in paths]
 
         for path in paths:
-            if os.path.exists(path):
-                repos = self.detect_git_repositories(path)
-                for repo in repos:
-                    self.monitored_repos[repo] = True
-
+            if self.watch_mode == WATCH_METADATA:
+                # Discovery adds the container directories and git dirs below
+                self.watch(os.path.realpath(path))
+            else:
                 observer.schedule(self, path, recursive=True)
-                self.logger.info(f"Monitoring path: {path}")
+            self.logger.info(f"Monitoring path: {path} ({self.watch_mode})")
 
         observer.start()
+        self.record_startup_metric('observer_ready')
+
+        # Events are handled while discovery streams repositories in
+        threading.Thread(
+            target=self.detect_git_repositories,
+            args=paths,
+            name='repo-discovery',
+            daemon=True
+        ).start()
 
         try:
             while True:
                 time.sleep(1)
+                self.reflogs.save()
         except KeyboardInterrupt:
             observer.stop()
             self.logger.info("Monitoring stopped")
 
         observer.join()
+        self.pipeline.close()
+        self.logger.info(f"Event pipeline: {self.pipeline.counters()}")
+        self.coalescer.close()
+        self.reflogs.save()
+        copy_index.close()
+        self.dirty_checks.close()
+        self.repo_handles.clear()
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+import logging
+from typing import Dict, Optional, Tuple
+
+
+MAX_SYMREF_DEPTH = 5
+
+
+def resolve_git_dirs(repo_path: str) -> Tuple[str, str]:
+    """Return (git_dir, common_dir) for a repository.
+
+    Worktrees and submodules have a ``.git`` file pointing at their git dir;
+    a worktree keeps HEAD and its own reflog there but shares refs with the
+    main repository's common dir.
+    """
+    git_dir = os.path.join(repo_path, '.git')
+    if os.path.isfile(git_dir):
+        with open(git_dir, 'r') as f:
+            content = f.read().strip()
+        if content.startswith('gitdir:'):
+            git_dir = os.path.normpath(os.path.join(repo_path, content[len('gitdir:'):].strip()))
+
+    common_dir = git_dir
+    try:
+        with open(os.path.join(git_dir, 'commondir'), 'r') as f:
+            common_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    except OSError:
+        pass
+    return git_dir, common_dir
+
+
+def _signature(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class RefResolver:
+    """Current branch and commit of a repository, read straight from its git dir.
+
+    HEAD, loose refs and ``packed-refs`` are parsed without running git.
+    Results are cached per repository together with the stat signature of
+    every file they were read from, so a lookup for an unchanged repository
+    costs a few stat() calls. ``packed-refs`` is parsed once per change and
+    shared between worktrees of the same repository.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._git_dirs = {}
+        self._results = {}
+        self._packed = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, repo_path: str) -> Tuple[Optional[str], Optional[str]]:
+        """Return (branch, commit); branch is None on a detached HEAD, commit on an unborn branch"""
+        try:
+            git_dir, common_dir = self._dirs(repo_path)
+        except OSError:
+            return None, None
+
+        cached = self._results.get(git_dir)
+        if cached and all(_signature(path) == signature for path, signature in cached[0]):
+            return cached[1]
+
+        sources = []
+        branch, commit = self._resolve(git_dir, common_dir, sources)
+        self._results[git_dir] = (sources, (branch, commit))
+        return branch, commit
+
+    def _dirs(self, repo_path: str) -> Tuple[str, str]:
+        dirs = self._git_dirs.get(repo_path)
+        if dirs is None:
+            dirs = resolve_git_dirs(repo_path)
+            self._git_dirs[repo_path] = dirs
+        return dirs
+
+    def _resolve(self, git_dir: str, common_dir: str, sources: list) -> Tuple[Optional[str], Optional[str]]:
+        head_path = os.path.join(git_dir, 'HEAD')
+        sources.append((head_path, _signature(head_path)))
+        value = _read(head_path)
+        if not value:
+            return None, None
+        if not value.startswith('ref:'):
+            return None, value
+
+        ref = value[len('ref:'):].strip()
+        branch = ref[len('refs/heads/'):] if ref.startswith('refs/heads/') else ref
+        for _ in range(MAX_SYMREF_DEPTH):
+            # Per-worktree refs live in the git dir, shared ones in the common dir
+            base = git_dir if ref.startswith(('refs/bisect/', 'refs/worktree/')) else common_dir
+            ref_path = os.path.join(base, *ref.split('/'))
+            sources.append((ref_path, _signature(ref_path)))
+            value = _read(ref_path)
+            if value is None:
+                return branch, self._packed_ref(common_dir, ref, sources)
+            if not value.startswith('ref:'):
+                return branch, value
+            ref = value[len('ref:'):].strip()
+        return branch, None
+
+    def _packed_ref(self, common_dir: str, ref: str, sources: list) -> Optional[str]:
+        packed_path = os.path.join(common_dir, 'packed-refs')
+        signature = _signature(packed_path)
+        sources.append((packed_path, signature))
+        if signature is None:
+            return None
+
+        with self._lock:
+            cached = self._packed.get(packed_path)
+            if not cached or cached[0] != signature:
+                cached = (signature, self._parse_packed_refs(packed_path))
+                self._packed[packed_path] = cached
+        return cached[1].get(ref)
+
+    @staticmethod
+    def _parse_packed_refs(path: str) -> Dict[str, str]:
+        refs = {}
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    # Comments and peeled tag lines (^<sha>)
+                    if line.startswith(('#', '^')):
+                        continue
+                    parts = line.split()
+                    if len(parts) == 2:
+                        refs[parts[1]] = parts[0]
+        except OSError:
+            pass
+        return refs
+
+
+ref_resolver = RefResolver()
+
+
+def benchmark(repo_path: str, lookups: int = 10000, gitpython_lookups: int = 200):
+    """Compare RefResolver with GitPython's active_branch and head.commit"""
+    resolver = RefResolver()
+    resolver.resolve(repo_path)
+    started = time.perf_counter()
+    for _ in range(lookups):
+        branch, commit = resolver.resolve(repo_path)
+    native = (time.perf_counter() - started) / lookups
+    print(f"{'RefResolver.resolve':<32} {native * 1e6:>10.2f} us/lookup  ({branch}, {commit})")
+
+    try:
+        import git
+    except ImportError:
+        print("GitPython is not installed, skipping the comparison")
+        return
+
+    started = time.perf_counter()
+    for _ in range(gitpython_lookups):
+        repo = git.Repo(repo_path)
+        branch, commit = repo.active_branch.name, repo.head.commit.hexsha
+    gitpython = (time.perf_counter() - started) / gitpython_lookups
+    print(f"{'git.Repo().active_branch':<32} {gitpython * 1e6:>10.2f} us/lookup  ({branch}, {commit})")
+
+
+if __name__ == '__main__':
+    import sys
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else '.')
@@ -0,0 +1,84 @@
+import random
+import time
+import logging
+from typing import Callable, Optional
+
+
+# Longest a freshly started agent waits before its first heartbeat
+MAX_INITIAL_DELAY = 5.0
+
+
+class HeartbeatScheduler:
+    """Decides when the next heartbeat is due and whether it is needed at all.
+
+    Every delay gets random jitter so agents started together drift apart.
+    The interval backs off while the backend fails or answers slowly and
+    returns to normal after a healthy heartbeat. A heartbeat is skipped when
+    an activity batch was delivered within the current interval, because the
+    backend has already heard from this device.
+    """
+
+    def __init__(self, interval: float, jitter: float = 0.2, max_backoff: float = 8.0,
+                 slow_response: float = 2.0,
+                 last_delivery: Optional[Callable[[], Optional[float]]] = None):
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.slow_response = slow_response
+        self.last_delivery = last_delivery
+        self.backoff = 1.0
+        self.last_sent = None
+        self.logger = logging.getLogger(__name__)
+        self.stats = {'sent': 0, 'skipped': 0, 'failed': 0}
+
+    def initial_delay(self) -> float:
+        """Small random offset that spreads out agents started in lockstep.
+
+        Kept to a fraction of the interval (at most MAX_INITIAL_DELAY), so a
+        new agent does not show offline until its first heartbeat; the
+        jitter on every later delay keeps them apart.
+        """
+        return random.uniform(0, min(self.interval * self.jitter, MAX_INITIAL_DELAY))
+
+    def next_delay(self) -> float:
+        base = self.interval * self.backoff
+        return base * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def should_skip(self) -> bool:
+        if self.last_delivery is None:
+            return False
+        delivered_at = self.last_delivery()
+        if delivered_at is None:
+            return False
+        return time.time() - delivered_at < self.interval
+
+    def record(self, success: bool, latency: float):
+        if not success:
+            self.stats['failed'] += 1
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+        elif latency > self.slow_response:
+            self.stats['sent'] += 1
+            self.backoff = min(self.backoff * 1.5, self.max_backoff)
+        else:
+            self.stats['sent'] += 1
+            self.backoff = 1.0
+        self.last_sent = time.time()
+
+        if self.backoff > 1.0:
+            self.logger.debug(f"Heartbeat backing off to {self.interval * self.backoff:.0f}s")
+
+    def beat(self, send: Callable[[], bool]) -> bool:
+        """Send a heartbeat through ``send`` unless it can be skipped."""
+        if self.should_skip():
+            self.stats['skipped'] += 1
+            self.logger.debug("Skipping heartbeat, recent activity upload counts as liveness")
+            return True
+
+        started = time.monotonic()
+        try:
+            success = send()
+        except Exception:
+            self.record(False, time.monotonic() - started)
+            raise
+        self.record(success, time.monotonic() - started)
+        return success
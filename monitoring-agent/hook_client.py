@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Hook Client
+Forwards a git hook check to the resident agent daemon
+
+Only the standard library is imported so the hook starts in milliseconds.
+Exits with the daemon's verdict, or with EXIT_UNAVAILABLE when no daemon is
+running so the hook can fall back to the standalone agents.
+"""
+
+import os
+import sys
+import json
+import socket
+
+SOCKET_PATH = os.path.join(os.path.expanduser('~'), '.devmonitor', 'agent.sock')
+EXIT_UNAVAILABLE = 75
+TIMEOUT = 15
+COMMANDS = ('verify', 'verify-all', 'location', 'operation')
+
+
+def parse_args(argv):
+    if not argv or argv[0] not in COMMANDS:
+        print(f"Usage: hook_client.py {{{'|'.join(COMMANDS)}}} --repo-id ID [--repo-path PATH] "
+              f"[--api-url URL] [--token TOKEN] [--operation OP]", file=sys.stderr)
+        sys.exit(2)
+
+    request = {
+        'command': argv[0],
+        'api_url': os.getenv('API_URL', 'http://localhost:5000'),
+        'token': os.getenv('API_TOKEN'),
+        'repo_path': '.'
+    }
+    options = argv[1:]
+    for name, value in zip(options[::2], options[1::2]):
+        request[name.lstrip('-').replace('-', '_')] = value
+
+    request['repo_path'] = os.path.abspath(request['repo_path'])
+    return request
+
+
+def main():
+    """Main function"""
+    request = parse_args(sys.argv[1:])
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(TIMEOUT)
+    try:
+        client.connect(SOCKET_PATH)
+    except OSError:
+        sys.exit(EXIT_UNAVAILABLE)
+
+    try:
+        client.sendall(json.dumps(request).encode() + b'\n')
+        reply = b''
+        while not reply.endswith(b'\n'):
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            reply += chunk
+        response = json.loads(reply)
+    except (OSError, ValueError):
+        sys.exit(EXIT_UNAVAILABLE)
+    finally:
+        client.close()
+
+    sys.stdout.write(response.get('output', ''))
+    sys.exit(response.get('exit_code', 1))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,9 +7,51 @@ Installs git hooks to verify device on clone and monitor repository access
 import os
 import sys
 import stat
+import hashlib
 from pathlib import Path
 
 # Git hook templates
+# Every check is first sent to the resident agent daemon (started by
+# `agent.py monitor`) through hook_client.py, which only imports the standard
+# library. When no daemon is running the client exits with 75 and the hook
+# falls back to running the standalone agent script.
+HOOK_AGENT_FUNCTIONS = '''
+AGENT_DIR="monitoring-agent"
+API_URL="${API_URL:-http://localhost:5000}"
+
+run_agent_check() {
+    CHECK="$1"
+
+    python3 -S "$AGENT_DIR/hook_client.py" "$CHECK" \\
+        --api-url "$API_URL" \\
+        --token "$API_TOKEN" \\
+        --repo-id "$REPO_ID" \\
+        --repo-path "."
+    CHECK_STATUS=$?
+
+    if [ $CHECK_STATUS -ne 75 ]; then
+        return $CHECK_STATUS
+    fi
+
+    case "$CHECK" in
+        verify|verify-all)
+            python3 "$AGENT_DIR/repo_protection_agent.py" "$CHECK" \\
+                --api-url "$API_URL" \\
+                --token "$API_TOKEN" \\
+                --repo-id "$REPO_ID" \\
+                --repo-path "."
+            ;;
+        location)
+            python3 "$AGENT_DIR/copy_detection_monitor.py" \\
+                --api-url "$API_URL" \\
+                --token "$API_TOKEN" \\
+                --repo-id "$REPO_ID" \\
+                --repo-path "."
+            ;;
+    esac
+}
+'''
+
 POST_CLONE_HOOK = '''#!/bin/bash
 # Post-clone hook - Verify device registration
 
@@ -19,23 +61,15 @@ echo "🔍 Verifying device registration..."
 if [ -f ".env" ]; then
     source .env
 fi
-
-API_URL="${API_URL:-http://localhost:5000}"
-API_TOKEN="${API_TOKEN}"
-REPO_ID="${REPO_ID}"
-
+''' + HOOK_AGENT_FUNCTIONS + '''
 # Check if monitoring agent is available
-if [ ! -f "monitoring-agent/copy_detection_monitor.py" ]; then
+if [ ! -f "$AGENT_DIR/copy_detection_monitor.py" ]; then
     echo "⚠️  Warning: Monitoring agent not found"
     exit 0
 fi
 
 # Run device verification
-python3 monitoring-agent/copy_detection_monitor.py \\
-    --api-url "$API_URL" \\
-    --token "$API_TOKEN" \\
-    --repo-id "$REPO_ID" \\
-    --repo-path "."
+run_agent_check location
 
 if [ $? -ne 0 ]; then
     echo "❌ Device verification failed!"
@@ -65,13 +99,9 @@ echo "🔍 Verifying device and repository access..."
 if [ -f ".env" ]; then
     source .env
 fi
-
-API_URL="${API_URL:-http://localhost:5000}"
-API_TOKEN="${API_TOKEN}"
-REPO_ID="${REPO_ID}"
-
+''' + HOOK_AGENT_FUNCTIONS + '''
 # Check if monitoring agent is available
-if [ ! -f "monitoring-agent/copy_detection_monitor.py" ]; then
+if [ ! -f "$AGENT_DIR/copy_detection_monitor.py" ]; then
     echo "⚠️  Warning: Monitoring agent not found"
     echo "   Repository protection may not be active."
     echo ""
@@ -90,12 +120,8 @@ if [ "$1" = "0000000000000000000000000000000000000000" ]; then
     echo "Checking your device registration status..."
     echo ""
     
-    # Run device verification
-    python3 monitoring-agent/repo_protection_agent.py verify \\
-        --api-url "$API_URL" \\
-        --token "$API_TOKEN" \\
-        --repo-id "$REPO_ID" \\
-        --repo-path "."
+    # Run device verification (the location check is part of verify-all)
+    run_agent_check verify-all
     
     VERIFY_STATUS=$?
     
@@ -146,14 +172,8 @@ if [ "$1" = "0000000000000000000000000000000000000000" ]; then
     echo ""
 fi
 
-# Check if repository was moved/copied (for all checkouts)
-python3 monitoring-agent/copy_detection_monitor.py \\
-    --api-url "$API_URL" \\
-    --token "$API_TOKEN" \\
-    --repo-id "$REPO_ID" \\
-    --repo-path "."
-
-if [ $? -ne 0 ]; then
+# Check if repository was moved/copied (for all other checkouts)
+if [ "$1" != "0000000000000000000000000000000000000000" ] && ! run_agent_check location; then
     echo ""
     echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
     echo "⚠️  REPOSITORY LOCATION VERIFICATION FAILED"
@@ -181,13 +201,9 @@ echo "🔍 Verifying repository access..."
 if [ -f ".env" ]; then
     source .env
 fi
-
+''' + HOOK_AGENT_FUNCTIONS + '''
 # Verify device and repository
-python3 monitoring-agent/repo_protection_agent.py verify \\
-    --api-url "${API_URL:-http://localhost:5000}" \\
-    --token "$API_TOKEN" \\
-    --repo-id "$REPO_ID" \\
-    --repo-path "."
+run_agent_check verify
 
 if [ $? -ne 0 ]; then
     echo ""
@@ -228,14 +244,10 @@ echo "🔍 Verifying repository integrity before push..."
 if [ -f ".env" ]; then
     source .env
 fi
-
-# Check repository location
-echo "   → Checking repository location..."
-python3 monitoring-agent/copy_detection_monitor.py \\
-    --api-url "${API_URL:-http://localhost:5000}" \\
-    --token "$API_TOKEN" \\
-    --repo-id "$REPO_ID" \\
-    --repo-path "."
+''' + HOOK_AGENT_FUNCTIONS + '''
+# Check repository location and device authorization in one request
+echo "   → Checking repository location and device authorization..."
+run_agent_check verify-all
 
 if [ $? -ne 0 ]; then
     echo ""
@@ -243,40 +255,17 @@ if [ $? -ne 0 ]; then
     echo "❌ REPOSITORY INTEGRITY CHECK FAILED"
     echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
     echo ""
-    echo "⚠️  Cannot push from this location."
+    echo "⚠️  Cannot push from this device or location."
     echo ""
-    echo "This repository may have been:"
-    echo "  • Copied to an unauthorized location"
-    echo "  • Moved without approval"
-    echo "  • Accessed from an untrusted path"
+    echo "Possible reasons:"
+    echo "  • Repository copied to an unauthorized location"
+    echo "  • Repository moved without approval"
+    echo "  • Device not registered or not approved"
     echo ""
     echo "📋 Solution:"
     echo "  1. Use repository from original location"
     echo "  2. Contact administrator to add trusted path"
-    echo "  3. Do not copy repository to USB or external drives"
-    echo ""
-    echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
-    echo ""
-    exit 1
-fi
-
-# Verify device access
-echo "   → Verifying device authorization..."
-python3 monitoring-agent/repo_protection_agent.py verify \\
-    --api-url "${API_URL:-http://localhost:5000}" \\
-    --token "$API_TOKEN" \\
-    --repo-id "$REPO_ID" \\
-    --repo-path "."
-
-if [ $? -ne 0 ]; then
-    echo ""
-    echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
-    echo "❌ DEVICE VERIFICATION FAILED"
-    echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
-    echo ""
-    echo "⚠️  Your device is not authorized to push."
-    echo ""
-    echo "Contact your administrator to verify device status."
+    echo "  3. Contact your administrator to verify device status"
     echo ""
     echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
     echo ""
@@ -287,6 +276,20 @@ echo "✅ All checks passed - push allowed"
 exit 0
 '''
 
+HOOKS = [
+    ('post-checkout', POST_CHECKOUT_HOOK),
+    ('pre-commit', PRE_COMMIT_HOOK),
+    ('pre-push', PRE_PUSH_HOOK)
+]
+
+# Fleet installs point every repository at one shared, versioned hooks
+# directory. `current` is a symlink to the active version, so upgrading or
+# uninstalling across all repositories is a single atomic rename.
+SHARED_HOOKS_DIR = Path.home() / '.devmonitor' / 'hooks'
+AGENT_DIR = Path(__file__).resolve().parent
+HOOK_MARKER = 'run_agent_check'
+KEEP_VERSIONS = 3
+
 def install_hook(repo_path, hook_name, hook_content):
     """Install a git hook"""
     hooks_dir = repo_path / '.git' / 'hooks'
@@ -320,18 +323,12 @@ def install_all_hooks(repo_path):
     print(f"\nInstalling repository protection hooks...")
     print(f"Repository: {repo_path}\n")
     
-    hooks = [
-        ('post-checkout', POST_CHECKOUT_HOOK),
-        ('pre-commit', PRE_COMMIT_HOOK),
-        ('pre-push', PRE_PUSH_HOOK)
-    ]
-    
     success_count = 0
-    for hook_name, hook_content in hooks:
+    for hook_name, hook_content in HOOKS:
         if install_hook(repo_path, hook_name, hook_content):
             success_count += 1
     
-    print(f"\n✓ Installed {success_count}/{len(hooks)} hooks successfully")
+    print(f"\n✓ Installed {success_count}/{len(HOOKS)} hooks successfully")
     
     # Create setup instructions
     setup_file = repo_path / '.repo-setup-instructions.md'
@@ -411,9 +408,7 @@ def uninstall_hooks(repo_path):
     
     print(f"\nUninstalling repository protection hooks...")
     
-    hooks = ['post-checkout', 'pre-commit', 'pre-push']
-    
-    for hook_name in hooks:
+    for hook_name, _ in HOOKS:
         hook_file = hooks_dir / hook_name
         backup_file = hooks_dir / f"{hook_name}.backup"
         
@@ -429,6 +424,189 @@ def uninstall_hooks(repo_path):
     print("\n✓ Hooks uninstalled")
     return True
 
+def render_hook(hook_content, agent_dir=AGENT_DIR):
+    """Point a hook at an absolute agent directory instead of the repository's copy"""
+    return hook_content.replace('AGENT_DIR="monitoring-agent"', f'AGENT_DIR="{agent_dir}"')
+
+def publish_shared_hooks(base_dir=SHARED_HOOKS_DIR):
+    """Write this version of the hooks and atomically make it the current one"""
+    rendered = [(name, render_hook(content)) for name, content in HOOKS]
+    version = hashlib.sha256(''.join(content for _, content in rendered).encode()).hexdigest()[:12]
+    version_dir = base_dir / version
+    
+    if not version_dir.exists():
+        tmp_dir = base_dir / f'.{version}.{os.getpid()}.tmp'
+        tmp_dir.mkdir(parents=True)
+        for hook_name, hook_content in rendered:
+            hook_file = tmp_dir / hook_name
+            with open(hook_file, 'w') as f:
+                f.write(hook_content)
+            hook_file.chmod(0o755)
+        try:
+            tmp_dir.rename(version_dir)
+        except OSError:
+            # Published concurrently by another installer
+            import shutil
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    
+    swap_current(base_dir, version)
+    prune_versions(base_dir, version)
+    return base_dir / 'current'
+
+def swap_current(base_dir, target):
+    """Atomically repoint (or with target=None, remove) the `current` symlink"""
+    current = base_dir / 'current'
+    if target is None:
+        try:
+            current.unlink()
+        except FileNotFoundError:
+            pass
+        return
+    
+    tmp_link = base_dir / f'.current.{os.getpid()}.tmp'
+    try:
+        tmp_link.unlink()
+    except FileNotFoundError:
+        pass
+    os.symlink(target, tmp_link)
+    os.replace(tmp_link, current)
+
+def prune_versions(base_dir, active):
+    """Keep the active hook version and the most recent previous ones"""
+    import shutil
+    
+    versions = sorted(
+        (path for path in base_dir.iterdir()
+         if path.is_dir() and not path.is_symlink() and not path.name.startswith('.')),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True
+    )
+    for path in versions[KEEP_VERSIONS:]:
+        if path.name != active:
+            shutil.rmtree(path, ignore_errors=True)
+
+def find_repositories(roots):
+    """Every git working tree under the given roots, including worktrees and submodules"""
+    from repo_discovery import RepositoryDiscovery
+    return [Path(repo) for repo in RepositoryDiscovery().discover(roots)]
+
+def run_git(repo_path, *args):
+    import subprocess
+    return subprocess.run(
+        ['git', '-C', str(repo_path), *args],
+        capture_output=True,
+        text=True
+    )
+
+def git_hooks_dir(repo_path):
+    """The hooks directory git uses for this working tree (handles worktrees and submodules)"""
+    result = run_git(repo_path, 'rev-parse', '--git-common-dir')
+    if result.returncode != 0:
+        return None
+    return (Path(repo_path) / result.stdout.strip()).resolve() / 'hooks'
+
+def has_custom_hooks(hooks_dir):
+    """True when the repository has its own hooks besides ours and git's samples"""
+    if not hooks_dir or not hooks_dir.is_dir():
+        return False
+    for hook_file in hooks_dir.iterdir():
+        if not hook_file.is_file() or hook_file.suffix in ('.sample', '.backup'):
+            continue
+        try:
+            if HOOK_MARKER not in hook_file.read_text(errors='ignore'):
+                return True
+        except OSError:
+            return True
+    return False
+
+def copy_hooks(hooks_dir):
+    """Copy the rendered hooks into one repository, keeping its own hooks as backups"""
+    for hook_name, hook_content in HOOKS:
+        hook_file = hooks_dir / hook_name
+        if hook_file.exists() and HOOK_MARKER not in hook_file.read_text(errors='ignore'):
+            hook_file.rename(hooks_dir / f"{hook_name}.backup")
+        with open(hook_file, 'w') as f:
+            f.write(render_hook(hook_content))
+        hook_file.chmod(hook_file.stat().st_mode | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH)
+
+def install_repository(repo_path, shared_path):
+    """Install hooks in one repository, returning (repo_path, mode, detail)"""
+    try:
+        configured = run_git(repo_path, 'config', '--local', '--get', 'core.hooksPath').stdout.strip()
+        if configured and Path(configured).expanduser() != shared_path:
+            return repo_path, 'skipped', f'uses its own core.hooksPath ({configured})'
+        
+        hooks_dir = git_hooks_dir(repo_path)
+        if has_custom_hooks(hooks_dir):
+            copy_hooks(hooks_dir)
+            return repo_path, 'copied', 'has custom hooks'
+        
+        result = run_git(repo_path, 'config', '--local', 'core.hooksPath', str(shared_path))
+        if result.returncode != 0:
+            return repo_path, 'failed', result.stderr.strip()
+        return repo_path, 'linked', ''
+    except Exception as e:
+        return repo_path, 'failed', str(e)
+
+def uninstall_repository(repo_path, shared_path):
+    """Remove hooks from one repository, returning (repo_path, mode, detail)"""
+    try:
+        configured = run_git(repo_path, 'config', '--local', '--get', 'core.hooksPath').stdout.strip()
+        if configured and Path(configured).expanduser() == shared_path:
+            run_git(repo_path, 'config', '--local', '--unset', 'core.hooksPath')
+            return repo_path, 'unlinked', ''
+        
+        hooks_dir = git_hooks_dir(repo_path)
+        removed = False
+        for hook_name, _ in HOOKS:
+            hook_file = hooks_dir / hook_name if hooks_dir else None
+            if hook_file and hook_file.is_file() and HOOK_MARKER in hook_file.read_text(errors='ignore'):
+                hook_file.unlink()
+                backup_file = hooks_dir / f"{hook_name}.backup"
+                if backup_file.exists():
+                    backup_file.rename(hook_file)
+                removed = True
+        return repo_path, 'removed' if removed else 'untouched', ''
+    except Exception as e:
+        return repo_path, 'failed', str(e)
+
+def run_fleet(action, roots, jobs):
+    """Install or uninstall hooks in every repository under the roots, in parallel"""
+    from concurrent.futures import ThreadPoolExecutor
+    
+    shared_path = SHARED_HOOKS_DIR / 'current'
+    if action == 'install':
+        publish_shared_hooks()
+        task = install_repository
+    else:
+        # Removing the symlink disables the hooks everywhere at once,
+        # the per-repository cleanup below only tidies up the config
+        swap_current(SHARED_HOOKS_DIR, None)
+        task = uninstall_repository
+    
+    repositories = list(find_repositories(roots))
+    print(f"\nFound {len(repositories)} repositories under {', '.join(str(root) for root in roots)}")
+    
+    counts = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for repo_path, mode, detail in pool.map(lambda repo: task(repo, shared_path), repositories):
+            counts[mode] = counts.get(mode, 0) + 1
+            if mode in ('copied', 'skipped', 'failed'):
+                print(f"  {'✗' if mode == 'failed' else '•'} {repo_path}: {mode}, {detail}")
+    
+    summary = ', '.join(f"{count} {mode}" for mode, count in sorted(counts.items())) or 'nothing to do'
+    print(f"\n✓ {action.capitalize()} complete: {summary}")
+    return counts.get('failed', 0) == 0
+
+def default_roots():
+    """Roots from MONITORED_PATHS in the agent configuration, or the home directory"""
+    try:
+        import config
+        roots = config.MONITORED_PATHS
+    except ImportError:
+        roots = [path for path in os.getenv('MONITORED_PATHS', '').split(',') if path]
+    return roots or [str(Path.home())]
+
 def main():
     """Main function"""
     import argparse
@@ -446,9 +624,29 @@ def main():
         default='.',
         help='Repository path (default: current directory)'
     )
+    parser.add_argument(
+        '--all',
+        action='store_true',
+        help='Act on every repository under the roots using a shared hooks directory'
+    )
+    parser.add_argument(
+        '--roots',
+        nargs='+',
+        help='Directories to search with --all (default: MONITORED_PATHS or home directory)'
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=min(32, (os.cpu_count() or 1) * 4),
+        help='Repositories processed in parallel with --all'
+    )
     
     args = parser.parse_args()
     
+    if args.all:
+        success = run_fleet(args.action, args.roots or default_roots(), args.jobs)
+        sys.exit(0 if success else 1)
+    
     repo_path = Path(args.repo_path).resolve()
     
     # Check if it's a git repository
@@ -0,0 +1,223 @@
+import json
+import sqlite3
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+
+DEFAULT_OUTBOX_PATH = Path.home() / '.devmonitor' / 'outbox.db'
+
+
+class OutboxEntry(NamedTuple):
+    id: int
+    kind: str
+    endpoint: str
+    payload: Dict
+    created_at: float
+    attempts: int
+
+
+class Outbox:
+    """Crash-safe local store for payloads that could not be delivered.
+
+    Entries live in a SQLite database in WAL mode and are replayed in the
+    order they were written. Delivered entries are deleted and the file is
+    compacted once enough of them have been acknowledged.
+    """
+
+    def __init__(self, path: Optional[Path] = None, compact_threshold: int = 1000,
+                 max_entries: int = 100000):
+        self.path = Path(path) if path else DEFAULT_OUTBOX_PATH
+        self.compact_threshold = compact_threshold
+        self.max_entries = max_entries
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._acked_since_compaction = 0
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=5, check_same_thread=False)
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS outbox ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' kind TEXT NOT NULL,'
+                ' endpoint TEXT NOT NULL,'
+                ' payload TEXT NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' attempts INTEGER NOT NULL DEFAULT 0)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS outbox_kind ON outbox (kind, id)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def append(self, kind: str, endpoint: str, payload: Dict):
+        self.extend(kind, endpoint, [payload])
+
+    def extend(self, kind: str, endpoint: str, payloads: Iterable[Dict]):
+        now = time.time()
+        rows = [(kind, endpoint, json.dumps(payload, default=str), now) for payload in payloads]
+        if not rows:
+            return
+
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    'INSERT INTO outbox (kind, endpoint, payload, created_at) VALUES (?, ?, ?, ?)',
+                    rows
+                )
+                overflow = conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0] - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        'DELETE FROM outbox WHERE id IN (SELECT id FROM outbox ORDER BY id LIMIT ?)',
+                        (overflow,)
+                    )
+                    self.logger.warning(f"Outbox full, discarded {overflow} oldest entries")
+
+    def pending(self, kinds: Optional[List[str]] = None) -> int:
+        query, params = self._kind_filter('SELECT COUNT(*) FROM outbox', kinds)
+        with self._lock:
+            return self._connection().execute(query, params).fetchone()[0]
+
+    def peek(self, limit: int, kinds: Optional[List[str]] = None) -> List[OutboxEntry]:
+        query, params = self._kind_filter(
+            'SELECT id, kind, endpoint, payload, created_at, attempts FROM outbox',
+            kinds
+        )
+        query += ' ORDER BY id LIMIT ?'
+        params.append(limit)
+
+        with self._lock:
+            rows = self._connection().execute(query, params).fetchall()
+        return [
+            OutboxEntry(row[0], row[1], row[2], json.loads(row[3]), row[4], row[5])
+            for row in rows
+        ]
+
+    def ack(self, ids: List[int]):
+        if not ids:
+            return
+
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany('DELETE FROM outbox WHERE id = ?', [(entry_id,) for entry_id in ids])
+            self._acked_since_compaction += len(ids)
+            if self._acked_since_compaction >= self.compact_threshold:
+                self._compact(conn)
+
+    def mark_attempt(self, ids: List[int]):
+        if not ids:
+            return
+
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    'UPDATE outbox SET attempts = attempts + 1 WHERE id = ?',
+                    [(entry_id,) for entry_id in ids]
+                )
+
+    def replay(self, deliver: Callable[[List[OutboxEntry]], int],
+               kinds: Optional[List[str]] = None, chunk_size: int = 100) -> int:
+        """Replay pending entries in order, ``chunk_size`` at a time.
+
+        ``deliver`` receives a chunk and returns how many leading entries of
+        it were delivered. Replay stops at the first undelivered entry so the
+        original ordering is preserved on the next attempt.
+        """
+        delivered_total = 0
+        while True:
+            chunk = self.peek(chunk_size, kinds)
+            if not chunk:
+                break
+
+            try:
+                delivered = deliver(chunk)
+            except Exception as e:
+                self.logger.error(f"Outbox replay failed: {str(e)}")
+                delivered = 0
+
+            self.ack([entry.id for entry in chunk[:delivered]])
+            delivered_total += delivered
+
+            if delivered < len(chunk):
+                self.mark_attempt([chunk[delivered].id])
+                break
+
+        if delivered_total:
+            self.logger.info(f"Replayed {delivered_total} entries from outbox")
+        return delivered_total
+
+    def compact(self):
+        with self._lock:
+            self._compact(self._connection())
+
+    def _compact(self, conn: sqlite3.Connection):
+        conn.execute('PRAGMA incremental_vacuum')
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        self._acked_since_compaction = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @staticmethod
+    def _kind_filter(query: str, kinds: Optional[List[str]]):
+        if not kinds:
+            return query, []
+        query += f" WHERE kind IN ({', '.join('?' for _ in kinds)})"
+        return query, list(kinds)
+
+
+# Worth retrying: the payload may be accepted once the token is renewed or
+# the backend stops throttling
+RETRYABLE_STATUSES = frozenset({401, 403, 408, 429})
+
+
+def is_rejection(status_code: int) -> bool:
+    """Whether the backend refused the payload itself, so retrying it cannot help"""
+    return 400 <= status_code < 500 and status_code not in RETRYABLE_STATUSES
+
+
+def http_deliverer(post: Callable, api_url: str, headers: Dict) -> Callable:
+    """Build a ``deliver`` callback that POSTs entries one at a time.
+
+    Entries the backend rejects as invalid are acknowledged so a malformed
+    payload cannot block the rest of the outbox. Authentication failures
+    keep the entry for after the token is renewed.
+    """
+    def deliver(entries: List[OutboxEntry]) -> int:
+        delivered = 0
+        for entry in entries:
+            try:
+                response = post(
+                    f'{api_url}{entry.endpoint}',
+                    headers=headers,
+                    json=entry.payload
+                )
+            except Exception:
+                break
+            if response.status_code >= 400 and not is_rejection(response.status_code):
+                break
+            if response.status_code >= 400:
+                logging.getLogger(__name__).error(
+                    f"Discarding {entry.kind} rejected by the backend ({response.status_code})")
+            delivered += 1
+        return delivered
+
+    return deliver
+
+
+# Shared by the detectors in one process; the connection is opened on first use
+outbox = Outbox()
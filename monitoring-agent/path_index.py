@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from typing import Iterator, Optional
+
+
+_REPOSITORY = '\0'  # Cannot appear in a path component
+
+
+class PathIndex:
+    """Maps a path to the deepest registered repository that contains it.
+
+    Paths are stored in a trie keyed by path component, so a lookup costs
+    O(depth) regardless of how many repositories are registered, and
+    ``/src/app`` never matches ``/src/app-old``. Inserts take a lock; lookups
+    do not, because they only read dicts that are updated atomically, and can
+    run from watchdog's event thread while discovery keeps adding
+    repositories.
+    """
+
+    def __init__(self):
+        self._root = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _components(path: str):
+        return [part for part in os.path.normpath(path).split(os.sep) if part]
+
+    def add(self, path: str, value: Optional[str] = None) -> bool:
+        """Register a repository; returns False if it was already registered.
+
+        ``lookup`` returns ``value`` for paths under ``path``, ``path``
+        itself by default.
+        """
+        path = os.path.normpath(path)
+        with self._lock:
+            node = self._root
+            for part in self._components(path):
+                child = node.get(part)
+                if child is None:
+                    child = {}
+                    node[part] = child
+                node = child
+            if _REPOSITORY in node:
+                return False
+            node[_REPOSITORY] = value or path
+            self._count += 1
+            return True
+
+    def remove(self, path: str) -> bool:
+        with self._lock:
+            node = self._root
+            for part in self._components(path):
+                node = node.get(part)
+                if node is None:
+                    return False
+            if node.pop(_REPOSITORY, None) is None:
+                return False
+            self._count -= 1
+            return True
+
+    def lookup(self, path: str) -> Optional[str]:
+        """The repository owning ``path``, or None.
+
+        ``path`` is expected to be absolute and normalized, as watchdog
+        reports it, so it is split without normalizing again.
+        """
+        node = self._root
+        found = None
+        for part in path.split(os.sep):
+            if not part:
+                continue
+            node = node.get(part)
+            if node is None:
+                break
+            found = node.get(_REPOSITORY, found)
+        return found
+
+    def __contains__(self, path: str) -> bool:
+        node = self._root
+        for part in self._components(path):
+            node = node.get(part)
+            if node is None:
+                return False
+        return _REPOSITORY in node
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        return self._walk(self._root)
+
+    def under(self, path: str) -> Iterator[str]:
+        """Registered paths equal to or below ``path``, in O(depth + matches)"""
+        node = self._root
+        for part in self._components(path):
+            node = node.get(part)
+            if node is None:
+                return iter(())
+        return self._walk(node)
+
+    @staticmethod
+    def _walk(node) -> Iterator[str]:
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for key, value in list(node.items()):
+                if key == _REPOSITORY:
+                    yield value
+                else:
+                    stack.append(value)
+
+
+def benchmark(repositories=10000, events=100000, linear_sample=1000):
+    """Route events with the trie and with the linear startswith scan it replaced"""
+    import random
+
+    rng = random.Random(42)
+    repos = [f'/home/dev/work/group{i % 100}/project{i}' for i in range(repositories)]
+    paths = [f'{rng.choice(repos)}/src/module{rng.randrange(50)}/file{rng.randrange(500)}.py'
+             for _ in range(events)]
+
+    index = PathIndex()
+    started = time.perf_counter()
+    for repo in repos:
+        index.add(repo)
+    build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for path in paths:
+        index.lookup(path)
+    trie = (time.perf_counter() - started) / events
+
+    # The old scan is O(repositories) per event, so only a sample is timed
+    sample = paths[:linear_sample]
+    started = time.perf_counter()
+    for path in sample:
+        [repo for repo in repos if path.startswith(repo)]
+    linear = (time.perf_counter() - started) / len(sample)
+
+    print(f"{repositories} repositories, {events} events (index built in {build * 1000:.1f} ms)")
+    print(f"{'PathIndex.lookup':<24} {trie * 1e6:>10.2f} us/event  {trie * events:>8.2f} s total")
+    print(f"{'startswith scan':<24} {linear * 1e6:>10.2f} us/event  {linear * events:>8.2f} s total (projected)")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,232 @@
+import json
+import os
+import re
+import threading
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+DEFAULT_STATE_FILE = Path.home() / '.devmonitor' / 'reflog_offsets.json'
+
+# <old sha> <new sha> <name> <<email>> <unix time> <tz>\t<message>
+REFLOG_LINE = re.compile(r'^([0-9a-f]{40,64}) ([0-9a-f]{40,64}) .*?<[^>]*> (\d+) ([+-]\d{4})\t?(.*)$')
+ZERO_SHA = re.compile(r'^0+$')
+
+ACTIVITY_TYPES = {
+    'commit': 'GIT_COMMIT',
+    'checkout': 'GIT_CHECKOUT',
+    'pull': 'GIT_PULL',
+    'clone': 'GIT_CLONE',
+    'push': 'GIT_PUSH'
+}
+
+# HEAD's reflog records every operation on the checked-out branch, and the
+# branch's own reflog repeats it. Branch and remote-tracking reflogs are only
+# reported for operations that never touch HEAD.
+REF_ONLY_ACTIONS = frozenset({'push', 'fetch', 'branch'})
+
+
+def parse_action(message: str) -> str:
+    """``commit (amend): fix`` -> ``commit``, ``update by push`` -> ``push``"""
+    if message == 'update by push':
+        return 'push'
+    head = message.split(':', 1)[0].strip()
+    return head.split(' ', 1)[0] if head else 'unknown'
+
+
+class ReflogTailer:
+    """Turns lines appended to a repository's reflogs into activities.
+
+    Every reflog file under ``<git dir>/logs`` has a remembered byte offset,
+    so a change event only reads the new lines. Git is never run. Offsets
+    are persisted, so operations made while the agent was stopped are
+    reported when their repository is registered again. A reflog found at
+    registration starts at its end, and one that was rewritten (``git
+    reflog expire``, ``git gc``) does too, so history is never replayed.
+    """
+
+    def __init__(self, state_file: Optional[Path] = DEFAULT_STATE_FILE):
+        self.state_file = Path(state_file) if state_file else None
+        self.logger = logging.getLogger(__name__)
+        self._offsets = self._load()
+        self._branches = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def register(self, git_dir: str, repo_path: str, from_start: bool = False,
+                 not_before: Optional[float] = None) -> List[dict]:
+        """Start tailing a repository's reflogs; returns what was missed since the last run.
+
+        ``from_start`` reads reflogs without an offset from the beginning,
+        for a repository that was just cloned or created.
+        """
+        activities = []
+        for log_path in self._reflogs(git_dir):
+            with self._lock:
+                known = log_path in self._offsets
+            if known or from_start:
+                activities.extend(self.read(log_path, git_dir, repo_path, not_before))
+            else:
+                self._start_at_end(log_path)
+        head_log = os.path.join(git_dir, 'logs', 'HEAD')
+        if os.path.exists(head_log):
+            self._branches[head_log] = self._read_head(git_dir)
+        return activities
+
+    def read(self, log_path: str, git_dir: str, repo_path: str, not_before: Optional[float] = None) -> List[dict]:
+        """Activities for the lines appended to ``log_path`` since the last read.
+
+        Reflogs that existed at registration already have an offset, so an
+        unknown one was created while watching (a new branch) and is read
+        from the start. Entries older than ``not_before`` (a Unix time) are
+        skipped, such as the history in the reflog of a copied repository.
+        """
+        with self._lock:
+            try:
+                with open(log_path, 'rb') as f:
+                    stat = os.fstat(f.fileno())
+                    inode, offset = self._offsets.get(log_path, (None, None))
+                    if offset is None:
+                        offset = 0
+                    elif inode != stat.st_ino or offset > stat.st_size:
+                        self.logger.debug(f"Reflog rewritten, skipping to its end: {log_path}")
+                        offset = stat.st_size
+                    f.seek(offset)
+                    data = f.read(stat.st_size - offset)
+            except OSError:
+                self._offsets.pop(log_path, None)
+                return []
+
+            # A line still being written is read on the next event
+            complete = data.rfind(b'\n') + 1
+            self._offsets[log_path] = (stat.st_ino, offset + complete)
+            self._dirty = True
+
+        ref = os.path.relpath(log_path, os.path.join(git_dir, 'logs')).replace(os.sep, '/')
+        activities = []
+        for line in data[:complete].decode('utf-8', 'replace').splitlines():
+            activity = self.to_activity(line, ref, log_path, git_dir, repo_path, not_before)
+            if activity:
+                activities.append(activity)
+        return activities
+
+    def to_activity(self, line: str, ref: str, log_path: str, git_dir: str, repo_path: str,
+                    not_before: Optional[float] = None) -> Optional[dict]:
+        match = REFLOG_LINE.match(line)
+        if not match:
+            return None
+        old_sha, new_sha, timestamp, tz, message = match.groups()
+        action = parse_action(message)
+        if ref != 'HEAD' and action not in REF_ONLY_ACTIONS:
+            return None
+        if not_before and int(timestamp) < not_before:
+            return None
+
+        if ref == 'HEAD':
+            branch = self._head_branch(log_path, git_dir, action, message)
+        else:
+            branch = re.sub(r'^refs/(heads|remotes)/', '', ref)
+
+        activity = {
+            'activityType': ACTIVITY_TYPES.get(action, 'REPO_ACCESS'),
+            'repository': os.path.basename(repo_path),
+            'details': {
+                'action': action,
+                'ref': ref,
+                'oldSha': None if ZERO_SHA.match(old_sha) else old_sha,
+                'newSha': None if ZERO_SHA.match(new_sha) else new_sha,
+                'message': message[:200],
+                'path': repo_path,
+                'source': 'reflog',
+                'timestamp': datetime.fromtimestamp(int(timestamp), timezone.utc).isoformat()
+            }
+        }
+        # Left out on a detached HEAD or a deleted ref; the backend rejects null
+        if branch:
+            activity['branch'] = branch
+        if not ZERO_SHA.match(new_sha):
+            activity['commitHash'] = new_sha
+        return activity
+
+    def _head_branch(self, log_path: str, git_dir: str, action: str, message: str) -> Optional[str]:
+        """The branch checked out when the HEAD reflog line was written"""
+        if action == 'checkout':
+            # checkout: moving from <old> to <new>; <new> is a commit or tag when detaching
+            target = message.rsplit(' to ', 1)
+            if len(target) == 2:
+                name = target[1].strip()
+                self._branches[log_path] = name if self._is_branch(git_dir, name) else None
+        if log_path not in self._branches:
+            self._branches[log_path] = self._read_head(git_dir)
+        return self._branches[log_path]
+
+    @staticmethod
+    def _is_branch(git_dir: str, name: str) -> bool:
+        """Whether ``name`` is a local branch, as loose ref or in ``packed-refs``"""
+        common_dir = git_dir
+        try:
+            with open(os.path.join(git_dir, 'commondir'), 'r') as f:
+                common_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+        except OSError:
+            pass
+        if os.path.isfile(os.path.join(common_dir, 'refs', 'heads', *name.split('/'))):
+            return True
+        try:
+            with open(os.path.join(common_dir, 'packed-refs'), 'r') as f:
+                return any(line.rstrip('\n').endswith(' refs/heads/' + name) for line in f)
+        except OSError:
+            return False
+
+    @staticmethod
+    def _read_head(git_dir: str) -> Optional[str]:
+        try:
+            with open(os.path.join(git_dir, 'HEAD'), 'r') as f:
+                head = f.read().strip()
+        except OSError:
+            return None
+        if head.startswith('ref: refs/heads/'):
+            return head[len('ref: refs/heads/'):]
+        return None
+
+    def _start_at_end(self, log_path: str):
+        try:
+            stat = os.stat(log_path)
+        except OSError:
+            return
+        with self._lock:
+            self._offsets[log_path] = (stat.st_ino, stat.st_size)
+            self._dirty = True
+
+    @staticmethod
+    def _reflogs(git_dir: str):
+        logs_dir = os.path.join(git_dir, 'logs')
+        for directory, _, files in os.walk(logs_dir):
+            for name in files:
+                yield os.path.join(directory, name)
+
+    def _load(self) -> Dict[str, tuple]:
+        if not self.state_file:
+            return {}
+        try:
+            with open(self.state_file, 'r') as f:
+                return {path: tuple(entry) for path, entry in json.load(f).items()}
+        except (OSError, ValueError, TypeError, AttributeError):
+            return {}
+
+    def save(self):
+        """Persist offsets; cheap to call when nothing changed"""
+        if not self.state_file or not self._dirty:
+            return
+        with self._lock:
+            offsets = dict(self._offsets)
+            self._dirty = False
+        try:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.state_file.with_suffix(f'.{os.getpid()}.tmp')
+            with open(tmp_file, 'w') as f:
+                json.dump(offsets, f, separators=(',', ':'))
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            self.logger.debug(f"Could not persist reflog offsets: {e}")
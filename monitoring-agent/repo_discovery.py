@@ -0,0 +1,216 @@
+import json
+import os
+import queue
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+DEFAULT_INDEX_FILE = Path.home() / '.devmonitor' / 'repo_index.json'
+INDEX_VERSION = 2
+MAX_DEPTH = 8
+WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Directories that never contain repositories worth monitoring but can hold
+# hundreds of thousands of entries
+PRUNE_DIRS = frozenset({
+    'node_modules', 'bower_components', '__pycache__', 'site-packages',
+    'venv', 'env', 'virtualenv', 'target', 'build', 'dist',
+    'Library', 'AppData', 'snap', 'Trash'
+})
+
+
+class RepositoryDiscovery:
+    """Finds git repositories with a pool of os.scandir workers.
+
+    Hidden directories and PRUNE_DIRS are not descended into unless they
+    are repositories themselves; anything deeper than ``max_depth`` is
+    skipped. Worktrees and submodules, whose ``.git`` is a file, are
+    found as well. Every scanned directory is stored in an on-disk index
+    with its mtime. On later runs, a directory whose mtime has not changed
+    is only stat()ed and its cached listing is reused, so startup only pays
+    for directories that changed.
+    """
+
+    def __init__(self, index_file: Optional[Path] = DEFAULT_INDEX_FILE, max_depth: int = MAX_DEPTH,
+                 workers: int = WORKERS, prune: Iterable[str] = PRUNE_DIRS):
+        self.index_file = Path(index_file) if index_file else None
+        self.max_depth = max_depth
+        self.workers = max(1, workers)
+        self.prune = frozenset(prune)
+        self.logger = logging.getLogger(__name__)
+        self.stats = {'scanned': 0, 'cached': 0, 'repositories': 0, 'seconds': 0.0}
+        self._stats_lock = threading.Lock()
+
+    def discover(self, roots: Iterable[str], on_repository: Optional[Callable[[str], None]] = None,
+                 on_directory: Optional[Callable[[str], None]] = None) -> List[str]:
+        """Return every repository under ``roots``.
+
+        ``on_repository`` is called from the worker threads as soon as each
+        repository is found, before the scan completes. ``on_directory`` is
+        called the same way for every scanned directory that is neither a
+        repository nor inside one.
+        """
+        started = time.monotonic()
+        roots = [os.path.realpath(os.path.expanduser(str(root))) for root in roots]
+        roots = [root for root in roots if os.path.isdir(root)]
+        self.stats = {'scanned': 0, 'cached': 0, 'repositories': 0, 'seconds': 0.0}
+
+        previous = self._load_index()
+        visited = {}
+        repositories = []
+        lock = threading.Lock()
+        pending = queue.Queue()
+
+        def worker():
+            while True:
+                item = pending.get()
+                if item is None:
+                    return
+                path, depth, in_repository = item
+                try:
+                    entry = self._scan(path, previous.get(path))
+                    if entry is not None:
+                        with lock:
+                            visited[path] = entry
+                        if entry['git']:
+                            with lock:
+                                repositories.append(path)
+                            self._notify(on_repository, path)
+                        elif not in_repository:
+                            self._notify(on_directory, path)
+                        if depth < self.max_depth:
+                            for name in self._children(path, entry):
+                                pending.put((os.path.join(path, name), depth + 1,
+                                             in_repository or entry['git']))
+                except Exception as e:
+                    self.logger.debug(f"Skipping {path}: {str(e)}")
+                finally:
+                    pending.task_done()
+
+        threads = [threading.Thread(target=worker, name='repo-discovery', daemon=True)
+                   for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for root in set(roots):
+            pending.put((root, 0, False))
+        pending.join()
+        for _ in threads:
+            pending.put(None)
+
+        self._save_index(previous, visited, roots)
+        self.stats['repositories'] = len(repositories)
+        self.stats['seconds'] = time.monotonic() - started
+        return sorted(repositories)
+
+    def _scan(self, path: str, cached: Optional[dict]) -> Optional[dict]:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        if cached and cached.get('mtime') == mtime:
+            self._count('cached')
+            return cached
+
+        is_repository = False
+        subdirs = []
+        pruned = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if name == '.git':
+                        # A directory for normal clones, a file for worktrees and submodules
+                        is_repository = True
+                    elif not entry.is_dir(follow_symlinks=False):
+                        continue
+                    elif name.startswith('.') or name in self.prune:
+                        pruned.append(name)
+                    else:
+                        subdirs.append(name)
+        except OSError:
+            return None
+
+        self._count('scanned')
+        return {'mtime': mtime, 'git': is_repository, 'dirs': subdirs, 'pruned': pruned}
+
+    def _children(self, path: str, entry: dict) -> List[str]:
+        """Subdirectories to scan: all unpruned ones, and pruned ones that are repositories"""
+        # Checked on every run: `git init` inside a pruned directory does not
+        # change the parent's mtime, so the cached entry cannot tell
+        return entry['dirs'] + [name for name in entry['pruned']
+                                if os.path.lexists(os.path.join(path, name, '.git'))]
+
+    def _notify(self, callback: Optional[Callable[[str], None]], path: str):
+        # A failing callback must not stop the scan below this directory
+        if not callback:
+            return
+        try:
+            callback(path)
+        except Exception as e:
+            self.logger.warning(f"Error handling {path}: {str(e)}")
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _config_key(self) -> list:
+        return [INDEX_VERSION, self.max_depth, sorted(self.prune)]
+
+    def _load_index(self) -> Dict[str, dict]:
+        if not self.index_file:
+            return {}
+        try:
+            with open(self.index_file, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if index.get('config') != self._config_key():
+            return {}
+        return index.get('dirs', {})
+
+    def _save_index(self, previous: Dict[str, dict], visited: Dict[str, dict], roots: List[str]):
+        if not self.index_file:
+            return
+        # Keep what other roots contributed, replace everything under the scanned ones
+        prefixes = tuple(root.rstrip(os.sep) + os.sep for root in roots)
+        dirs = {path: entry for path, entry in previous.items()
+                if path not in roots and not path.startswith(prefixes)}
+        dirs.update(visited)
+        try:
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.index_file.with_suffix(f'.{os.getpid()}.tmp')
+            with open(tmp_file, 'w') as f:
+                json.dump({'config': self._config_key(), 'dirs': dirs}, f, separators=(',', ':'))
+            os.replace(tmp_file, self.index_file)
+        except OSError as e:
+            self.logger.debug(f"Could not persist repository index: {e}")
+
+
+def benchmark(roots):
+    """Compare os.walk with a cold and a warm RepositoryDiscovery run"""
+    import tempfile
+
+    started = time.monotonic()
+    walked = 0
+    for root in roots:
+        for _, dirs, _ in os.walk(root):
+            if '.git' in dirs:
+                walked += 1
+                dirs.remove('.git')
+    print(f"{'os.walk':<28} {time.monotonic() - started:>8.2f} s  {walked} repositories")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        discovery = RepositoryDiscovery(index_file=Path(tmp_dir) / 'index.json')
+        for label in ('discovery (cold index)', 'discovery (warm index)'):
+            found = discovery.discover(roots)
+            print(f"{label:<28} {discovery.stats['seconds']:>8.2f} s  {len(found)} repositories  "
+                  f"({discovery.stats['scanned']} scanned, {discovery.stats['cached']} cached)")
+
+
+if __name__ == '__main__':
+    import sys
+    benchmark(sys.argv[1:] or [str(Path.home())])
@@ -9,15 +9,17 @@ import sys
 import json
 import hashlib
 import platform
-import requests
-import subprocess
 from pathlib import Path
 from datetime import datetime
 
+from access_decisions import access_decisions
+from device_fingerprint import DeviceFingerprint
+
 class RepositoryProtectionAgent:
-    def __init__(self, api_url, api_token=None):
+    def __init__(self, api_url, api_token=None, resident=False):
         self.api_url = api_url.rstrip('/')
         self.api_token = api_token
+        self.resident = resident
         self.headers = {
             'Content-Type': 'application/json'
         }
@@ -25,27 +27,9 @@ class RepositoryProtectionAgent:
             self.headers['Authorization'] = f'Bearer {api_token}'
     
     def get_device_fingerprint(self):
-        """Generate device fingerprint"""
+        """Get the cached device fingerprint and the device details it covers"""
         try:
-            # Get MAC addresses
-            if platform.system() == 'Windows':
-                result = subprocess.run(['getmac'], capture_output=True, text=True)
-                mac_info = result.stdout
-            else:
-                result = subprocess.run(['ifconfig'], capture_output=True, text=True)
-                mac_info = result.stdout
-            
-            device_info = {
-                'hostname': platform.node(),
-                'platform': platform.system(),
-                'arch': platform.machine(),
-                'mac_info': hashlib.sha256(mac_info.encode()).hexdigest()
-            }
-            
-            fingerprint_string = json.dumps(device_info, sort_keys=True)
-            fingerprint = hashlib.sha256(fingerprint_string.encode()).hexdigest()
-            
-            return fingerprint, device_info
+            return DeviceFingerprint.generate_host_fingerprint()
         except Exception as e:
             print(f"Error generating fingerprint: {e}")
             return None, None
@@ -83,10 +67,11 @@ class RepositoryProtectionAgent:
             'message': 'No protection detected'
         }
     
-    def verify_repository_access(self, repository_id, repo_path):
-        """Verify access to repository"""
+    def verify_repository_access(self, repository_id, repo_path, location=None, fingerprint=None):
+        """Verify access to repository, optionally reporting a local location check"""
         try:
-            fingerprint, device_info = self.get_device_fingerprint()
+            if fingerprint is None:
+                fingerprint, _ = self.get_device_fingerprint()
             
             if not fingerprint:
                 print("❌ Failed to generate device fingerprint")
@@ -106,25 +91,46 @@ class RepositoryProtectionAgent:
                     'details': protection_check
                 }
             
+            # Reuse a recent positive decision, refreshing it in the background
+            if not (location and location.get('detected')):
+                if access_decisions.lookup(fingerprint, repository_id, repo_path):
+                    if access_decisions.claim_refresh(fingerprint, repository_id, repo_path):
+                        self.refresh_in_background(repository_id, repo_path)
+                    print("✅ Device verified (cached decision)")
+                    return {
+                        'allowed': True,
+                        'cached': True,
+                        'message': 'Repository access authorized'
+                    }
+            
             # Verify with backend
+            import requests
+            import transport
+            
+            payload = {
+                'repositoryId': repository_id,
+                'repositoryPath': str(repo_path),
+                'deviceFingerprint': fingerprint
+            }
+            if location:
+                payload['location'] = location
+            
             try:
-                response = requests.post(
+                response = transport.post(
                     f'{self.api_url}/api/repository-protection/verify-access',
                     headers=self.headers,
-                    json={
-                        'repositoryId': repository_id,
-                        'repositoryPath': str(repo_path)
-                    },
-                    timeout=10
+                    json=payload
                 )
                 
                 if response.status_code == 200:
                     result = response.json()
+                    self.record_decision(fingerprint, repository_id, repo_path, result)
                     print("✅ Device verified and access authorized")
                     return result
                 elif response.status_code == 403:
                     result = response.json()
                     reason = result.get('reason', 'UNKNOWN')
+                    access_decisions.revoke(fingerprint, repository_id, repo_path)
                     
                     print(f"❌ Access denied: {reason}")
                     print(f"   {result.get('message', 'Access not authorized')}")
@@ -146,12 +152,14 @@ class RepositoryProtectionAgent:
                 print("   Please ensure the backend is running and accessible")
                 return {
                     'allowed': False,
+                    'offline': True,
                     'message': 'Backend server not accessible'
                 }
             except requests.exceptions.Timeout:
                 print("❌ Backend request timed out")
                 return {
                     'allowed': False,
+                    'offline': True,
                     'message': 'Backend request timeout'
                 }
         
@@ -162,6 +170,109 @@ class RepositoryProtectionAgent:
                 'message': f'Verification error: {str(e)}'
             }
     
+    def record_decision(self, fingerprint, repository_id, repo_path, result):
+        """Cache a positive backend decision, if the backend signed one"""
+        if result.get('allowed') and result.get('decisionToken'):
+            access_decisions.store(
+                fingerprint,
+                repository_id,
+                repo_path,
+                result['decisionToken']
+            )
+    
+    def refresh_decision(self, repository_id, repo_path):
+        """Ask the backend again, renewing or dropping the cached decision"""
+        import transport
+        
+        fingerprint, _ = self.get_device_fingerprint()
+        if not fingerprint:
+            return False
+        
+        try:
+            response = transport.post(
+                f'{self.api_url}/api/repository-protection/verify-access',
+                headers=self.headers,
+                json={
+                    'repositoryId': repository_id,
+                    'repositoryPath': str(repo_path),
+                    'deviceFingerprint': fingerprint
+                }
+            )
+        except Exception:
+            # Keep the decision until it expires, the next refresh retries
+            return False
+        
+        if response.status_code == 200:
+            self.record_decision(fingerprint, repository_id, repo_path, response.json())
+            return True
+        if response.status_code == 403:
+            access_decisions.revoke(fingerprint, repository_id, repo_path)
+        return False
+    
+    def refresh_in_background(self, repository_id, repo_path):
+        """Refresh a cached decision without delaying the hook"""
+        if self.resident:
+            import threading
+            threading.Thread(
+                target=self.refresh_decision,
+                args=(repository_id, repo_path),
+                daemon=True
+            ).start()
+            return
+        
+        # Hooks exit right away, so refresh from a detached process
+        import subprocess
+        env = dict(os.environ)
+        if self.api_token:
+            env['API_TOKEN'] = self.api_token
+        subprocess.Popen(
+            [
+                sys.executable, os.path.abspath(__file__), 'refresh',
+                '--api-url', self.api_url,
+                '--repo-id', repository_id,
+                '--repo-path', str(Path(repo_path).resolve())
+            ],
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+    
+    def verify_all(self, repository_id, repo_path):
+        """Location, lock and device checks with a single backend round trip"""
+        from copy_detection_monitor import RepositoryCopyDetector
+        
+        detector = RepositoryCopyDetector(self.api_url, self.api_token, repo_path, repository_id)
+        location = detector.detect_copy_attempt()
+        
+        if location['detected']:
+            print(f"\n⚠️  COPY DETECTED: {location['reason']}")
+            detector.show_alert_ui(location)
+        else:
+            print("✓ Repository location verified")
+        
+        fingerprint, _ = self.get_device_fingerprint()
+        result = self.verify_repository_access(repository_id, repo_path, location, fingerprint)
+        
+        if location['detected']:
+            detector.encrypt_repository()
+            if result.get('reason') != 'COPY_DETECTED':
+                # Offline, or the backend did not record the detection; keep the alert for replay
+                detector.queue_alert(detector.alert_payload({
+                    'message': "Repository copied to unauthorized location",
+                    'repository_id': repository_id,
+                    'detection': location,
+                    'device_fingerprint': fingerprint
+                }))
+            return {
+                'allowed': False,
+                'message': location.get('message', 'Repository copied to unauthorized location'),
+                'details': location
+            }
+        
+        return result
+    
     def create_local_lock(self, repo_path, reason_data):
         """Create local protection lock"""
         repo_path = Path(repo_path)
@@ -190,7 +301,8 @@ class RepositoryProtectionAgent:
                     'message': 'Failed to generate device fingerprint'
                 }
             
-            response = requests.post(
+            import transport
+            response = transport.post(
                 f'{self.api_url}/api/repository-protection/register-device',
                 headers=self.headers,
                 json={'deviceName': device_name}
@@ -298,7 +410,7 @@ def main():
     )
     parser.add_argument(
         'command',
-        choices=['register', 'verify', 'monitor', 'status'],
+        choices=['register', 'verify', 'verify-all', 'refresh', 'monitor', 'status'],
         help='Command to execute'
     )
     parser.add_argument(
@@ -340,12 +452,15 @@ def main():
             print(f"\n✗ Registration failed: {result.get('message')}")
             sys.exit(1)
     
-    elif args.command == 'verify':
+    elif args.command in ['verify', 'verify-all']:
         if not args.repo_id:
             print("Error: --repo-id is required")
             sys.exit(1)
         
-        result = agent.verify_repository_access(args.repo_id, args.repo_path)
+        if args.command == 'verify-all':
+            result = agent.verify_all(args.repo_id, args.repo_path)
+        else:
+            result = agent.verify_repository_access(args.repo_id, args.repo_path)
         
         if result.get('allowed'):
             print("\n✓ Access authorized")
@@ -354,6 +469,13 @@ def main():
             print(f"\n✗ Access denied: {result.get('message')}")
             sys.exit(1)
     
+    elif args.command == 'refresh':
+        if not args.repo_id:
+            print("Error: --repo-id is required")
+            sys.exit(1)
+        
+        sys.exit(0 if agent.refresh_decision(args.repo_id, args.repo_path) else 1)
+    
     elif args.command == 'monitor':
         if not args.repo_id:
             print("Error: --repo-id is required")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Startup Budget
+Fails when an agent command imports more than it should at startup
+
+Git hooks start a new interpreter for every check, so import time is paid on
+each clone, commit and push. Every command is run under `python -X importtime`
+and checked against an import-time budget and a list of modules it must not
+import at all.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+AGENT_DIR = Path(__file__).resolve().parent
+HEAVY_MODULES = ('watchdog', 'git', 'cryptography', 'psutil')
+
+# (name, script arguments, extra interpreter flags, budget in ms, forbidden modules)
+COMMANDS = [
+    ('hook client', ['hook_client.py', 'verify', '--repo-id', 'budget'], ['-S'], 40,
+     HEAVY_MODULES + ('requests',)),
+    ('repo protection status', ['repo_protection_agent.py', 'status'], [], 120,
+     HEAVY_MODULES + ('requests',)),
+    ('copy detection --help', ['copy_detection_monitor.py', '--help'], [], 120,
+     HEAVY_MODULES + ('requests',)),
+    ('access detection --help', ['access_detection_agent.py', '--help'], [], 120,
+     HEAVY_MODULES + ('requests',)),
+    ('hook installer --help', ['install_git_hooks.py', '--help'], [], 60,
+     HEAVY_MODULES + ('requests',)),
+    ('agent status', ['agent.py', 'status'], [], 400, HEAVY_MODULES),
+]
+
+
+def parse_importtime(stderr):
+    """Return (total import time in us, set of imported top-level packages)"""
+    total = 0
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip().split('.')[0])
+        # Nested imports are indented, their time is already in the parent's
+        if not name[1:].startswith(' '):
+            total += int(cumulative)
+    return total, modules
+
+
+def measure(args, flags, rounds, home):
+    """Run one command ``rounds`` times and keep the fastest import time"""
+    import subprocess
+
+    env = dict(os.environ, HOME=home, PYTHONDONTWRITEBYTECODE='1')
+    env.pop('API_TOKEN', None)
+
+    best = None
+    modules = set()
+    for _ in range(rounds):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', *flags, str(AGENT_DIR / args[0]), *args[1:]],
+            cwd=home,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=60
+        )
+        if 'Traceback (most recent call last)' in result.stderr:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        total, imported = parse_importtime(result.stderr)
+        best = total if best is None else min(best, total)
+        modules |= imported
+    return best, modules
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Check agent command startup against import-time budgets'
+    )
+    parser.add_argument(
+        '--rounds',
+        type=int,
+        default=3,
+        help='Runs per command, the fastest one is compared (default: 3)'
+    )
+    parser.add_argument(
+        '--scale',
+        type=float,
+        default=float(os.getenv('STARTUP_BUDGET_SCALE', '1.0')),
+        help='Multiply every budget, for slow CI machines (default: 1.0)'
+    )
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as home:
+        for name, command, flags, budget, forbidden in COMMANDS:
+            limit = budget * args.scale
+            try:
+                total, modules = measure(command, flags, args.rounds, home)
+            except Exception as e:
+                print(f"✗ {name:<26} failed to run: {e}")
+                failures += 1
+                continue
+
+            elapsed = total / 1000
+            leaked = sorted(set(forbidden) & modules)
+            ok = elapsed <= limit and not leaked
+            failures += not ok
+
+            print(f"{'✓' if ok else '✗'} {name:<26} {elapsed:>7.1f} ms  (budget {limit:.0f} ms)")
+            if leaked:
+                print(f"    imports forbidden modules: {', '.join(leaked)}")
+
+    if failures:
+        print(f"\n❌ {failures} command(s) over their startup budget")
+        sys.exit(1)
+    print("\n✅ All commands within their startup budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Shared HTTP transport
+One pooled keep-alive session with latency budgets, jittered retries and a
+circuit breaker per backend and endpoint class
+"""
+
+import random
+import threading
+import time
+import logging
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from circuit_breaker import DEFAULT_STATE_FILE, CircuitBreaker
+
+
+CONNECT_TIMEOUT = 3.05
+# Total time, retries included, a call to an endpoint may take. Hook-facing
+# checks get tight budgets so a struggling backend cannot stall git.
+LATENCY_BUDGETS = {
+    '/api/access-detection/': 3.0,
+    '/api/repository-protection/verify-access': 3.0,
+    '/api/devices/': 5.0,
+    '/api/alerts': 5.0,
+    '/api/activities': 10.0
+}
+DEFAULT_BUDGET = 10.0
+# Endpoints that fail independently of each other get their own circuit, so
+# failing activity uploads cannot suspend the hooks' access checks
+ENDPOINT_CLASSES = {
+    '/api/access-detection/': 'access',
+    '/api/repository-protection/': 'access',
+    '/api/devices/': 'devices',
+    '/api/alerts': 'alerts',
+    '/api/activities': 'activities'
+}
+DEFAULT_CLASS = 'other'
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+RETRIES = 2
+BACKOFF_BASE = 0.2
+BACKOFF_CAP = 2.0
+# Gateway errors mean the backend never handled the request, so even a POST
+# can safely be sent again.
+RETRY_STATUSES = {502, 503, 504}
+# Where breakers share their state between processes; benchmarks point it
+# elsewhere so they do not touch the agent's circuits
+BREAKER_STATE_FILE = DEFAULT_STATE_FILE
+
+logger = logging.getLogger(__name__)
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def create_session(headers: Optional[Dict] = None) -> requests.Session:
+    """Create a session with a tuned keep-alive connection pool."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide session shared by all agents."""
+    global _shared_session
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                _shared_session = create_session()
+    return _shared_session
+
+
+def _by_prefix(table: Dict, url: str, default):
+    path = urlsplit(url).path
+    matches = [prefix for prefix in table if path.startswith(prefix)]
+    return table[max(matches, key=len)] if matches else default
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+    """Return the circuit breaker for the backend and endpoint class serving ``url``."""
+    name = f'{urlsplit(url).netloc}/{_by_prefix(ENDPOINT_CLASSES, url, DEFAULT_CLASS)}'
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, state_file=BREAKER_STATE_FILE)
+        return breaker
+
+
+def latency_budget(url: str) -> float:
+    return _by_prefix(LATENCY_BUDGETS, url, DEFAULT_BUDGET)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+def request(method: str, url: str, session: Optional[requests.Session] = None,
+            timeout=None, retries: int = RETRIES, budget: Optional[float] = None,
+            **kwargs) -> requests.Response:
+    """Send a request over the pooled session within the endpoint's latency budget.
+
+    Connection failures and gateway errors are retried with jittered
+    backoff while the budget allows. Read timeouts are not retried because
+    the backend may already have acted on the request. While the backend's
+    circuit is open the call fails immediately with CircuitOpenError.
+    """
+    session = session or get_session()
+    breaker = get_breaker(url)
+    breaker.allow()
+
+    deadline = time.monotonic() + (budget or latency_budget(url))
+    # The breaker counts logical calls: only the last attempt's outcome is
+    # recorded, and a call that ends without one still frees the probe slot
+    succeeded = None
+    try:
+        for attempt in range(retries + 1):
+            remaining = max(deadline - time.monotonic(), 0.1)
+            attempt_timeout = timeout or (min(CONNECT_TIMEOUT, remaining), remaining)
+
+            try:
+                response = session.request(method, url, timeout=attempt_timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if isinstance(e, requests.exceptions.ReadTimeout) or attempt == retries:
+                    succeeded = False
+                    raise
+                logger.debug(f"{method} {url} failed ({e}), retrying")
+                retry_error = e
+            else:
+                succeeded = response.status_code < 500
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+                logger.debug(f"{method} {url} returned {response.status_code}, retrying")
+                retry_error = None
+
+            delay = backoff_delay(attempt)
+            # Stop retrying once the budget is spent or another call opened the circuit
+            if time.monotonic() + delay >= deadline or breaker.is_open():
+                succeeded = False
+                if retry_error is not None:
+                    raise retry_error
+                return response
+            succeeded = None
+            time.sleep(delay)
+    finally:
+        if succeeded is None:
+            breaker.release()
+        elif succeeded:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request('GET', url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request('POST', url, **kwargs)
@@ -0,0 +1,42 @@
+"""
+Watch Support
+Lets agents define filesystem event handlers without importing watchdog
+until they actually start watching
+"""
+
+import time
+
+
+class EventHandler:
+    """Minimal stand-in for watchdog's FileSystemEventHandler.
+
+    Implements the dispatch() protocol watchdog observers call, so hook
+    entry points that never watch anything do not pay for importing watchdog.
+    """
+
+    def dispatch(self, event):
+        self.on_any_event(event)
+        handler = getattr(self, f'on_{event.event_type}', None)
+        if handler:
+            handler(event)
+
+    def on_any_event(self, event):
+        pass
+
+
+def watch(handler, path, recursive=True, stop_message="Monitoring stopped"):
+    """Watch ``path`` with ``handler`` until interrupted"""
+    from watchdog.observers import Observer
+
+    observer = Observer()
+    observer.schedule(handler, str(path), recursive=recursive)
+    observer.start()
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        observer.stop()
+        print(f"\n\n{stop_message}")
+
+    observer.join()